@@ -0,0 +1,46 @@
+import time
+from functools import wraps
+from flask import jsonify, make_response
+
+# Responses that signal congestion rather than a bad request or a plain failure
+CONGESTION_STATUSES = (503, 504)
+
+
+def admission_controlled(controller):
+    """
+    Shed a route's requests early when the adaptive concurrency limit is reached.
+
+    Rejected requests get a 503 with a computed Retry-After header. Admitted
+    requests feed their latency and outcome back into the controller; only
+    503 and 504 responses (upstream timeouts and overload, queue timeouts)
+    count as overload signals, so client mistakes and other failures do not
+    shrink the limit.
+
+    Args:
+        controller (AdmissionController): Controller shared by the generation routes
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            admitted, retry_after = controller.try_acquire()
+            if not admitted:
+                response = jsonify({
+                    'error': 'Server is overloaded, please retry later',
+                    'status': 'error',
+                    'retry_after': retry_after
+                })
+                response.status_code = 503
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+
+            started = time.perf_counter()
+            error = False
+            try:
+                response = make_response(view(*args, **kwargs))
+                error = response.status_code in CONGESTION_STATUSES
+                return response
+            finally:
+                controller.release((time.perf_counter() - started) * 1000, error)
+
+        return wrapper
+    return decorator
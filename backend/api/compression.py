@@ -0,0 +1,63 @@
+import gzip
+import zlib
+from flask import request
+
+# Mimetypes worth compressing; everything else is passed through untouched
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html')
+
+
+def _accepts_gzip():
+    """Return True if the current request accepts a gzip-encoded response."""
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def _gzip_stream(chunks, level):
+    """Gzip a chunk iterator, flushing after every chunk so clients see items as they arrive."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def init_compression(app):
+    """
+    Register gzip negotiation for deployments that are not behind the nginx gzip block.
+
+    Enabled with COMPRESS_RESPONSES; regular responses are compressed when they
+    exceed COMPRESS_MIN_SIZE bytes, streamed responses are compressed chunk by chunk.
+    """
+    if not app.config.get('COMPRESS_RESPONSES'):
+        return app
+
+    level = app.config.get('COMPRESS_LEVEL', 6)
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers
+                or not _accepts_gzip()):
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        if response.is_streamed:
+            response.response = _gzip_stream(response.response, level)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers.pop('Content-Length', None)
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        response.set_data(gzip.compress(data, compresslevel=level))
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    return app
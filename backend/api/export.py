@@ -0,0 +1,172 @@
+import io
+import json
+import tarfile
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import Response, current_app, stream_with_context
+from models.storage_model import _encode_cursor, _decode_cursor
+from api.serialization import dumps, NDJSON_MIMETYPE
+
+TAR_GZ_MIMETYPE = 'application/gzip'
+
+# PAX header carrying the resume cursor of each tar member
+CURSOR_PAX_HEADER = 'contentgen.cursor'
+
+
+class ContentExport:
+    """
+    Iterate over every stored document matching a filter, page by page.
+
+    Yields (item, content, cursor) tuples where `item` is the listing entry,
+    `content` the retrieved document (None if it could not be read, with the
+    error in item['error']) and `cursor` an opaque resume point: passing it
+    back restarts the export right after that document. The cursor records
+    the document's own listing position rather than a count, so documents
+    saved in between are neither skipped nor exported twice. Only one page of
+    listing entries and `prefetch` documents are held in memory at a time.
+    When the backend is S3, documents are fetched in parallel ahead of the
+    one being written.
+    """
+
+    def __init__(self, storage, content_type=None, start_date=None, end_date=None,
+                 cursor=None, page_size=200, prefetch=8):
+        """
+        Initialize the export; an invalid cursor raises ValueError immediately.
+
+        Args:
+            storage: Storage manager of any backend
+            content_type (str): Type of content to export
+            start_date (str): ISO date string for start date filter
+            end_date (str): ISO date string for end date filter
+            cursor (str): Resume cursor from an interrupted export
+            page_size (int): Listing page size
+            prefetch (int): Documents fetched ahead in parallel (S3 only)
+        """
+        state = _decode_cursor(cursor) or {}
+        if cursor and 'page' not in state:
+            raise ValueError("Cursor does not belong to an export")
+
+        self.storage = storage
+        self.filters = (content_type, start_date, end_date)
+        self.page_size = page_size
+        self.prefetch = prefetch if getattr(storage, 'use_s3', False) else 1
+
+        # Pull the first entry now so listing errors surface before streaming starts
+        self._entries = self._iter_entries(storage.iter_content(*self.filters, page_size, state.get('page')))
+        self._first = next(self._entries, None)
+
+    def _iter_entries(self, page):
+        """Yield (item, cursor) for each listed document, following page cursors."""
+        while True:
+            for item in page:
+                yield item, _encode_cursor({'page': _encode_cursor(page.position)})
+            if not page.next_cursor:
+                return
+            page = self.storage.iter_content(*self.filters, self.page_size, page.next_cursor)
+
+    def _fetch(self, app, item):
+        """Retrieve one document inside an app context (runs on prefetch threads)."""
+        with app.app_context():
+            return self.storage.retrieve_content(item['key'])
+
+    def __iter__(self):
+        app = current_app._get_current_object()
+        entries = itertools.chain([self._first] if self._first else [], self._entries)
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.prefetch) as executor:
+            try:
+                for item, cursor in entries:
+                    pending.append((item, cursor, executor.submit(self._fetch, app, item)))
+                    if len(pending) < self.prefetch:
+                        continue
+                    yield self._result(*pending.popleft())
+
+                while pending:
+                    yield self._result(*pending.popleft())
+            finally:
+                # Stop fetching ahead if the client went away
+                for _, _, future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def _result(item, cursor, future):
+        """Unpack a prefetched retrieval into (item, content, cursor)."""
+        result = future.result()
+        if result.get('status') == 'error':
+            return {**item, 'error': result.get('error')}, None, cursor
+        return item, result['content'], cursor
+
+
+def _ndjson_export_chunks(export):
+    """Yield one JSON line per document with its content and resume cursor."""
+    for item, content, cursor in export:
+        yield dumps({**item, 'content': content, 'cursor': cursor}) + '\n'
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only file object collecting bytes until they are drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _tar_export_chunks(export):
+    """
+    Yield a gzipped tar stream with one member per document under its original key.
+
+    Each member carries its resume cursor in a PAX header. Documents that
+    could not be read are skipped and logged.
+    """
+    buffer = _ChunkBuffer()
+    with tarfile.open(fileobj=buffer, mode='w|gz', format=tarfile.PAX_FORMAT) as archive:
+        for item, content, cursor in export:
+            if content is None:
+                current_app.logger.warning(f"Export skipped {item['key']}: {item.get('error')}")
+                continue
+
+            body = json.dumps(content, indent=2).encode('utf-8')
+            info = tarfile.TarInfo(item['key'])
+            info.size = len(body)
+            info.mtime = datetime.fromisoformat(item['last_modified']).timestamp()
+            info.pax_headers = {CURSOR_PAX_HEADER: cursor}
+            archive.addfile(info, io.BytesIO(body))
+
+            data = buffer.drain()
+            if data:
+                yield data
+
+    yield buffer.drain()
+
+
+def stream_export(export, archive=False):
+    """
+    Build a streaming response for a content export.
+
+    Args:
+        export (ContentExport): Export to stream
+        archive (bool): Emit a gzipped tar instead of NDJSON
+
+    Returns:
+        Response: Streaming Flask response
+    """
+    if archive:
+        response = Response(stream_with_context(_tar_export_chunks(export)), mimetype=TAR_GZ_MIMETYPE)
+        response.headers['Content-Disposition'] = 'attachment; filename="content-export.tar.gz"'
+        return response
+
+    return Response(stream_with_context(_ndjson_export_chunks(export)), mimetype=NDJSON_MIMETYPE)
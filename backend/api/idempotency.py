@@ -0,0 +1,67 @@
+import hashlib
+from functools import wraps
+from flask import request, jsonify, make_response, current_app
+from api.scheduling import current_tenant
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def idempotent(store):
+    """
+    Make a POST route honour the Idempotency-Key header.
+
+    Requests without the header run normally. The first request with a key
+    runs and its successful response is stored; duplicates wait for it to
+    finish and replay the stored response without re-running the view.
+    Failed responses are not stored, so the client can retry them. Keys are
+    scoped to the tenant (see current_tenant) and the route, so clients that
+    pick the same key never see each other's responses.
+
+    Args:
+        store (IdempotencyStore): Store shared by all workers on the host
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not idempotency_key:
+                return view(*args, **kwargs)
+
+            # The tenant is hashed so API keys are not stored in the clear
+            tenant = hashlib.sha256(current_tenant().encode('utf-8')).hexdigest()[:32]
+            key = f"{tenant}:{request.path}:{idempotency_key}"
+            fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+            outcome, stored = store.begin(key, fingerprint)
+
+            if outcome == store.REPLAY:
+                status_code, body = stored
+                response = current_app.response_class(body, status=status_code, mimetype='application/json')
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            if outcome == store.MISMATCH:
+                return jsonify({
+                    'error': 'Idempotency-Key was already used with a different request body',
+                    'status': 'error'
+                }), 422
+
+            if outcome == store.IN_PROGRESS:
+                return jsonify({
+                    'error': 'A request with this Idempotency-Key is still in progress',
+                    'status': 'error'
+                }), 409
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                store.release(key)
+                raise
+
+            if 200 <= response.status_code < 300:
+                store.complete(key, response.status_code, response.get_data())
+            else:
+                store.release(key)
+            return response
+
+        return wrapper
+    return decorator
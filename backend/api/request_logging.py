@@ -0,0 +1,238 @@
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+from flask import g, request, current_app, has_request_context
+from flask.logging import default_handler
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+PROMPT_POLICIES = ('redact', 'truncate', 'full')
+
+# LogRecord attributes that are not structured fields
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def log_context(**fields):
+    """Attach structured fields (tokens, model, prompt...) to the current request's access record."""
+    if has_request_context():
+        g.setdefault('log_fields', {}).update(fields)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+
+    Extra fields passed to the logger become top-level keys. Prompt fields
+    are redacted, truncated or kept according to the prompt policy, and every
+    other string is capped at max_field_chars.
+    """
+
+    def __init__(self, prompt_policy='redact', prompt_chars=100, max_field_chars=1000):
+        super().__init__()
+        self.prompt_policy = prompt_policy
+        self.prompt_chars = prompt_chars
+        self.max_field_chars = max_field_chars
+
+    def _clip(self, value, limit):
+        """Truncate a string, noting how much was cut."""
+        if isinstance(value, str) and len(value) > limit:
+            return f"{value[:limit]}... [{len(value) - limit} more chars]"
+        return value
+
+    def _prompt(self, value):
+        """Apply the prompt policy to a prompt field."""
+        if not isinstance(value, str) or self.prompt_policy == 'full':
+            return self._clip(value, self.max_field_chars)
+        if self.prompt_policy == 'truncate':
+            return self._clip(value, self.prompt_chars)
+        return f"[redacted {len(value)} chars]"
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': self._clip(record.getMessage(), self.max_field_chars)
+        }
+
+        for key, value in vars(record).items():
+            if key in _RECORD_ATTRIBUTES or key in entry:
+                continue
+            entry[key] = self._prompt(value) if key == 'prompt' else self._clip(value, self.max_field_chars)
+
+        if record.exc_info:
+            entry['exception'] = self._clip(self.formatException(record.exc_info), self.max_field_chars * 4)
+
+        return json.dumps(entry, separators=(',', ':'), default=str)
+
+
+class _RequestContextFilter(logging.Filter):
+    """Stamp records with the request id and route of the request that logged them."""
+
+    def filter(self, record):
+        if has_request_context() and not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id')
+            record.route = request.url_rule.rule if request.url_rule else request.path
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never waits: a full queue drops the record and counts it."""
+
+    def __init__(self, log_queue, pipeline):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        # Records stay in this process, so skip the formatting QueueHandler does
+        # for pickling; the listener thread formats them
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            self.pipeline._count('enqueued')
+        except queue.Full:
+            self.pipeline._count('dropped')
+
+    def handle(self, record):
+        started = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            self.pipeline._add_overhead(time.perf_counter() - started)
+
+
+class LogPipeline:
+    """
+    Non-blocking structured logging for the app.
+
+    Request threads only put records on a bounded in-memory queue; a
+    QueueListener thread formats them as JSON and writes them to stderr or
+    LOG_FILE. When the queue is full, records are dropped instead of blocking
+    a request. Every request gets an id (taken from X-Request-ID when the
+    client sends one) and one access record with its route, status, latency
+    and any fields attached with log_context(). Successful requests can be
+    sampled; errors are always logged. Counters cover enqueued, dropped and
+    sampled-out records and the request-thread cost of each record.
+    """
+
+    def __init__(self, queue_size=10000, success_sample_rate=1.0):
+        """
+        Initialize the pipeline.
+
+        Args:
+            queue_size (int): Maximum records waiting to be written
+            success_sample_rate (float): Fraction of successful requests that get an access record
+        """
+        self.queue_size = queue_size
+        self.success_sample_rate = success_sample_rate
+        self.queue = None
+        self.listener = None
+        self._lock = threading.Lock()
+        self._counters = {'enqueued': 0, 'dropped': 0, 'sampled_out': 0}
+        self._overhead_s = 0.0
+        self._overhead_calls = 0
+
+    def init_app(self, app):
+        """Route the app logger through the queue, start the writer thread and register request hooks."""
+        self.queue_size = app.config.get('LOG_QUEUE_SIZE', self.queue_size)
+        self.success_sample_rate = app.config.get('LOG_SUCCESS_SAMPLE_RATE', self.success_sample_rate)
+
+        if not app.config.get('LOG_STRUCTURED', True):
+            return
+
+        prompt_policy = app.config.get('LOG_PROMPT_POLICY', 'redact')
+        if prompt_policy not in PROMPT_POLICIES:
+            raise ValueError(f"Unknown prompt log policy: {prompt_policy}")
+
+        log_file = app.config.get('LOG_FILE')
+        sink = WatchedFileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+        sink.setFormatter(JSONFormatter(
+            prompt_policy=prompt_policy,
+            prompt_chars=app.config.get('LOG_PROMPT_CHARS', 100),
+            max_field_chars=app.config.get('LOG_MAX_FIELD_CHARS', 1000)
+        ))
+
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        handler = _NonBlockingQueueHandler(self.queue, self)
+        handler.addFilter(_RequestContextFilter())
+
+        app.logger.removeHandler(default_handler)
+        app.logger.addHandler(handler)
+        app.logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+        app.logger.propagate = False
+
+        if self.listener is not None:
+            self.listener.stop()
+        else:
+            atexit.register(self.close)
+        self.listener = QueueListener(self.queue, sink, respect_handler_level=True)
+        self.listener.start()
+
+        app.before_request(self._start_request)
+        app.after_request(self._log_request)
+
+    def _count(self, name, amount=1):
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] += amount
+
+    def _add_overhead(self, seconds):
+        """Account time spent handing one record to the queue on a request thread."""
+        with self._lock:
+            self._overhead_s += seconds
+            self._overhead_calls += 1
+
+    def _start_request(self):
+        """Assign the request id and start the latency clock."""
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        g.log_started = time.perf_counter()
+
+    def _log_request(self, response):
+        """Write the access record (subject to sampling) and echo the request id."""
+        response.headers[REQUEST_ID_HEADER] = g.get('request_id', '')
+
+        if response.status_code < 400 and random.random() >= self.success_sample_rate:
+            self._count('sampled_out')
+        else:
+            latency_ms = (time.perf_counter() - g.get('log_started', time.perf_counter())) * 1000
+            current_app.logger.log(
+                logging.WARNING if response.status_code >= 500 else logging.INFO,
+                'request',
+                extra={
+                    'method': request.method,
+                    'status': response.status_code,
+                    'latency_ms': round(latency_ms, 1),
+                    **g.get('log_fields', {})
+                }
+            )
+
+        return response
+
+    def close(self):
+        """Stop the writer thread after draining the queue."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stats(self):
+        """Return record counters, queue depth and the average request-thread cost of one record."""
+        with self._lock:
+            counters = dict(self._counters)
+            overhead_us = self._overhead_s / self._overhead_calls * 1e6 if self._overhead_calls else 0.0
+
+        return {
+            'enabled': self.queue is not None,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'queue_size': self.queue_size,
+            'success_sample_rate': self.success_sample_rate,
+            **counters,
+            'avg_overhead_us': round(overhead_us, 1)
+        }
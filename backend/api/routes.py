@@ -2,16 +2,98 @@ from flask import Blueprint, request, jsonify, current_app
 import json
 from models.openai_model import ContentGenerator
 from models.storage_model import StorageManager
+from models.sqlite_storage_model import SQLiteStorageManager
+from models.cache_model import DiskCache
+from models.manifest_model import ManifestIndex
+from models.usage_model import UsageLedger
+from models.routing_model import ModelRouter
+from models.idempotency_model import IdempotencyStore
+from models.scheduler_model import FairScheduler
+from models.admission_model import AdmissionController
+from models.cassette_model import Cassette
+from models.readiness_model import ReadinessMonitor
+from models.token_budget_model import TokenBudget
+from api.serialization import stream_items, wants_ndjson, NDJSON_MIMETYPE
+from api.export import ContentExport, stream_export, TAR_GZ_MIMETYPE
+from api.idempotency import idempotent
+from api.scheduling import scheduled
+from api.admission import admission_controlled
+from api.request_logging import LogPipeline, log_context
 
 # Create blueprints for API routes
 content_api = Blueprint('content_api', __name__)
 storage_api = Blueprint('storage_api', __name__)
+usage_api = Blueprint('usage_api', __name__)
+metrics_api = Blueprint('metrics_api', __name__)
 
 # Initialize models
-content_generator = ContentGenerator()
-storage_manager = StorageManager(use_s3=False)  # Use local storage for development
+log_pipeline = LogPipeline()
+usage_ledger = UsageLedger()
+model_router = ModelRouter()
+idempotency_store = IdempotencyStore()
+scheduler = FairScheduler()
+admission_controller = AdmissionController()
+upstream_cassette = Cassette()
+token_budget = TokenBudget()
+content_generator = ContentGenerator(
+    usage_ledger=usage_ledger, router=model_router, cassette=upstream_cassette, token_budget=token_budget
+)
+storage_cache = DiskCache()
+manifest_index = ManifestIndex()
+readiness_monitor = ReadinessMonitor()
+storage_manager = None  # Chosen from STORAGE_BACKEND in register_routes
+
+STORAGE_BACKENDS = ('local', 's3', 'sqlite')
+
+def create_storage_manager(app):
+    """Create the storage manager for the configured STORAGE_BACKEND."""
+    backend = app.config.get('STORAGE_BACKEND', 'local')
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    
+    if backend == 'sqlite':
+        manager = SQLiteStorageManager()
+        manager.init_app(app)
+        return manager
+    
+    return StorageManager(use_s3=backend == 's3', cache=storage_cache, manifests=manifest_index)
+
+def generation_error_status(result):
+    """Return the HTTP status for a failed generation: 400 for client mistakes, 503 for upstream congestion, else 500."""
+    if result.get('rejected'):
+        return 400
+    if result.get('overloaded'):
+        return 503
+    return 500
+
+def save_generated(result, content_type):
+    """
+    Save a generation result and record where it was stored.
+    
+    Every candidate of a multi-candidate result is saved in one bulk write and
+    gets its own 'saved' entry; a single result is saved as is.
+    """
+    candidates = result.get('candidates')
+    if not candidates:
+        saved = storage_manager.save_content({'content': result['content'], 'metadata': result['metadata']}, content_type)
+        result['saved'] = {key: saved[key] for key in ('status', 'location', 'error') if key in saved}
+        return
+    
+    contents = [
+        {
+            'content': candidate['content'],
+            'metadata': {**result['metadata'], 'candidate': candidate['index'], 'tokens': candidate['tokens']}
+        }
+        for candidate in candidates
+    ]
+    
+    for candidate, saved in zip(candidates, storage_manager.save_many(contents, content_type)):
+        candidate['saved'] = {key: saved[key] for key in ('status', 'location', 'error') if key in saved}
 
 @content_api.route('/generate', methods=['POST'])
+@idempotent(idempotency_store)
+@admission_controlled(admission_controller)
+@scheduled(scheduler)
 def generate_content():
     """Generate content using the OpenAI API."""
     try:
@@ -36,14 +118,22 @@ def generate_content():
             
         # Generate content
         result = content_generator.generate_content(prompt, content_type, options)
+        log_context(
+            prompt=prompt, content_type=content_type,
+            model=result.get('metadata', {}).get('model'), tokens=result.get('metadata', {}).get('tokens')
+        )
         
-        # Check for errors
+        # Check for errors; bad requests and upstream congestion get their own status codes
         if 'error' in result:
             return jsonify({
                 'error': result['error'],
                 'status': 'error'
-            }), 500
+            }), generation_error_status(result)
             
+        # Results (all candidates of one call together) can be saved in the same request
+        if options and options.get('save'):
+            save_generated(result, content_type)
+        
         return jsonify({
             'status': 'success',
             'data': result
@@ -57,6 +147,9 @@ def generate_content():
         }), 500
 
 @content_api.route('/generate-from-template', methods=['POST'])
+@idempotent(idempotency_store)
+@admission_controlled(admission_controller)
+@scheduled(scheduler)
 def generate_from_template():
     """Generate content using a template."""
     try:
@@ -84,14 +177,22 @@ def generate_from_template():
         result = content_generator.generate_with_template(
             template_name, template_vars, content_type, options
         )
+        log_context(
+            template=template_name, content_type=content_type,
+            model=result.get('metadata', {}).get('model'), tokens=result.get('metadata', {}).get('tokens')
+        )
         
-        # Check for errors
+        # Check for errors; bad requests and upstream congestion get their own status codes
         if 'error' in result:
             return jsonify({
                 'error': result['error'],
                 'status': 'error'
-            }), 500
+            }), generation_error_status(result)
             
+        # Results (all candidates of one call together) can be saved in the same request
+        if options and options.get('save'):
+            save_generated(result, content_type)
+        
         return jsonify({
             'status': 'success',
             'data': result
@@ -105,6 +206,7 @@ def generate_from_template():
         }), 500
 
 @storage_api.route('/save', methods=['POST'])
+@idempotent(idempotency_store)
 def save_content():
     """Save content to storage."""
     try:
@@ -176,6 +278,32 @@ def retrieve_content(filepath):
             'status': 'error'
         }), 500
 
+@storage_api.route('/delete/<path:filepath>', methods=['DELETE'])
+def delete_content(filepath):
+    """Delete content from storage."""
+    try:
+        # Delete content from storage
+        result = storage_manager.delete_content(filepath)
+        
+        # Check for errors; archived content cannot be deleted from its immutable bundle
+        if result.get('status') == 'error':
+            return jsonify({
+                'error': result.get('error', 'Unknown error'),
+                'status': 'error'
+            }), 409 if result.get('archived') else 500
+            
+        return jsonify({
+            'status': 'success',
+            'data': result
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Content Deletion Error: {str(e)}")
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
 @storage_api.route('/list', methods=['GET'])
 def list_content():
     """List available content."""
@@ -185,33 +313,173 @@ def list_content():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         limit = request.args.get('limit', 100, type=int)
+        cursor = request.args.get('cursor')
         
-        # List content from storage
-        result = storage_manager.list_content(content_type, start_date, end_date, limit)
+        if limit < 1:
+            return jsonify({
+                'error': 'Limit must be a positive integer',
+                'status': 'error'
+            }), 400
         
-        # Check for errors
-        if result.get('status') == 'error':
+        try:
+            page = storage_manager.iter_content(content_type, start_date, end_date, limit, cursor)
+        except ValueError as e:
             return jsonify({
-                'error': result.get('error', 'Unknown error'),
+                'error': str(e),
                 'status': 'error'
-            }), 500
-            
+            }), 400
+        
+        # Stream items as the storage backend yields them, as NDJSON or a chunked JSON array
+        return stream_items(page, ndjson=wants_ndjson(request))
+        
+    except Exception as e:
+        current_app.logger.error(f"Content Listing Error: {str(e)}")
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
+@storage_api.route('/export', methods=['GET'])
+def export_content():
+    """Export stored content with its documents, as NDJSON or a gzipped tar."""
+    try:
+        export_format = request.args.get('format')
+        if export_format is None:
+            best = request.accept_mimetypes.best_match((NDJSON_MIMETYPE, TAR_GZ_MIMETYPE))
+            export_format = 'tar' if best == TAR_GZ_MIMETYPE else 'ndjson'
+        
+        if export_format not in ('ndjson', 'tar'):
+            return jsonify({
+                'error': 'Format must be ndjson or tar',
+                'status': 'error'
+            }), 400
+        
+        try:
+            export = ContentExport(
+                storage_manager,
+                content_type=request.args.get('content_type'),
+                start_date=request.args.get('start_date'),
+                end_date=request.args.get('end_date'),
+                cursor=request.args.get('cursor'),
+                page_size=current_app.config.get('EXPORT_PAGE_SIZE', 200),
+                prefetch=current_app.config.get('EXPORT_PREFETCH', 8)
+            )
+        except ValueError as e:
+            return jsonify({
+                'error': str(e),
+                'status': 'error'
+            }), 400
+        
+        # Documents are streamed as they are retrieved; each carries a cursor to resume from
+        return stream_export(export, archive=export_format == 'tar')
+        
+    except Exception as e:
+        current_app.logger.error(f"Content Export Error: {str(e)}")
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
+@usage_api.route('', methods=['GET'])
+def usage_rollup():
+    """Return hourly or daily token usage rollups."""
+    try:
+        result = usage_ledger.rollup(
+            granularity=request.args.get('granularity', 'hour'),
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            model=request.args.get('model'),
+            content_type=request.args.get('content_type'),
+            template=request.args.get('template')
+        )
+        
         return jsonify({
             'status': 'success',
-            'data': result
+            'data': {
+                'rollups': result,
+                'count': len(result)
+            }
         })
         
+    except ValueError as e:
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 400
+        
     except Exception as e:
-        current_app.logger.error(f"Content Listing Error: {str(e)}")
+        current_app.logger.error(f"Usage Rollup Error: {str(e)}")
         return jsonify({
             'error': str(e),
             'status': 'error'
         }), 500
 
+@metrics_api.route('/scheduler', methods=['GET'])
+def scheduler_metrics():
+    """Return queue depth, concurrency and wait times per scheduler lane."""
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'lanes': scheduler.stats()
+        }
+    })
+
+@metrics_api.route('/admission', methods=['GET'])
+def admission_metrics():
+    """Return the adaptive concurrency limit and admission decisions."""
+    return jsonify({
+        'status': 'success',
+        'data': admission_controller.stats()
+    })
+
+@metrics_api.route('/storage-cache', methods=['GET'])
+def storage_cache_metrics():
+    """Return hit ratio, size and eviction counts of the local storage tier."""
+    try:
+        return jsonify({
+            'status': 'success',
+            'data': storage_cache.stats()
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Storage Cache Metrics Error: {str(e)}")
+        return jsonify({
+            'error': str(e),
+            'status': 'error'
+        }), 500
+
+@metrics_api.route('/logging', methods=['GET'])
+def logging_metrics():
+    """Return queue depth, dropped and sampled-out records and per-record overhead of the log pipeline."""
+    return jsonify({
+        'status': 'success',
+        'data': log_pipeline.stats()
+    })
+
 def register_routes(app):
     """Register all API routes with the Flask app."""
+    log_pipeline.init_app(app)
+    
+    global storage_manager
+    storage_manager = create_storage_manager(app)
+    
+    usage_ledger.init_app(app)
+    model_router.init_app(app)
+    upstream_cassette.init_app(app)
+    token_budget.init_app(app)
+    idempotency_store.init_app(app)
+    scheduler.init_app(app)
+    admission_controller.init_app(app)
+    storage_cache.init_app(app)
+    manifest_index.init_app(app, storage_manager)
+    
+    # Warm up clients and connections before the worker takes traffic
+    readiness_monitor.init_app(app, content_generator, storage_manager)
+    
     app.register_blueprint(content_api, url_prefix='/api/content')
     app.register_blueprint(storage_api, url_prefix='/api/storage')
+    app.register_blueprint(usage_api, url_prefix='/api/usage')
+    app.register_blueprint(metrics_api, url_prefix='/api/metrics')
     
     # Add API documentation route
     @app.route('/api', methods=['GET'])
@@ -223,23 +491,55 @@ def register_routes(app):
             'endpoints': {
                 '/api/content/generate': {
                     'methods': ['POST'],
-                    'description': 'Generate content using OpenAI API'
+                    'description': 'Generate content using OpenAI API (supports Idempotency-Key; options.n returns '
+                                   'several candidates from one call, with options.rank, options.dedupe and options.save)'
                 },
                 '/api/content/generate-from-template': {
                     'methods': ['POST'],
-                    'description': 'Generate content using a template'
+                    'description': 'Generate content using a template (supports Idempotency-Key)'
                 },
                 '/api/storage/save': {
                     'methods': ['POST'],
-                    'description': 'Save content to storage'
+                    'description': 'Save content to storage (supports Idempotency-Key)'
                 },
                 '/api/storage/retrieve/<filepath>': {
                     'methods': ['GET'],
                     'description': 'Retrieve content from storage'
                 },
+                '/api/storage/delete/<filepath>': {
+                    'methods': ['DELETE'],
+                    'description': 'Delete content from storage'
+                },
                 '/api/storage/list': {
                     'methods': ['GET'],
-                    'description': 'List available content'
+                    'description': 'List available content (streamed; send Accept: application/x-ndjson for NDJSON). '
+                                   'Pass the returned next_cursor as ?cursor= to fetch the next page'
+                },
+                '/api/storage/export': {
+                    'methods': ['GET'],
+                    'description': 'Stream stored documents as NDJSON or format=tar (gzipped tar keyed by the original '
+                                   'paths), filtered by content_type, start_date and end_date. Pass the cursor of the '
+                                   'last received document as ?cursor= to resume an interrupted export'
+                },
+                '/api/usage': {
+                    'methods': ['GET'],
+                    'description': 'Token usage rollups (granularity=hour|day, start, end, model, content_type, template)'
+                },
+                '/api/metrics/scheduler': {
+                    'methods': ['GET'],
+                    'description': 'Queue depth, concurrency and wait time per scheduler lane'
+                },
+                '/api/metrics/admission': {
+                    'methods': ['GET'],
+                    'description': 'Adaptive concurrency limit and admission/rejection counts'
+                },
+                '/api/metrics/logging': {
+                    'methods': ['GET'],
+                    'description': 'Structured log pipeline queue depth, dropped/sampled-out records and overhead'
+                },
+                '/api/metrics/storage-cache': {
+                    'methods': ['GET'],
+                    'description': 'Hit ratio, size and evictions of the local disk tier in front of S3'
                 }
             }
         })
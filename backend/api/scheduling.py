@@ -0,0 +1,49 @@
+from functools import wraps
+from flask import request, jsonify, make_response
+from models.scheduler_model import QueueTimeout, QueueFull
+
+TENANT_HEADER = 'X-API-Key'
+PRIORITY_HEADER = 'X-Priority'
+
+
+def current_tenant():
+    """Return the tenant id for the current request: its API key, or the client address."""
+    return request.headers.get(TENANT_HEADER) or f"anonymous:{request.remote_addr}"
+
+
+def scheduled(scheduler):
+    """
+    Run a route inside a fair-share scheduler slot.
+
+    The tenant is taken from the X-API-Key header and the lane from the
+    X-Priority header ('interactive' by default, or 'bulk'). The time spent
+    queued is returned in the X-Queue-Wait-Ms response header. A full lane
+    queue is answered with a 429 and a queue timeout with a 503, both with a
+    Retry-After header.
+
+    Args:
+        scheduler (FairScheduler): Scheduler shared by the generation routes
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            lane = scheduler.lane_for(request.headers.get(PRIORITY_HEADER, 'interactive').lower())
+
+            try:
+                with scheduler.slot(current_tenant(), lane) as wait_ms:
+                    response = make_response(view(*args, **kwargs))
+            except QueueTimeout as e:
+                response = jsonify({
+                    'error': str(e),
+                    'status': 'error',
+                    'retry_after': e.retry_after
+                })
+                response.status_code = 429 if isinstance(e, QueueFull) else 503
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+
+            response.headers['X-Queue-Wait-Ms'] = f"{wait_ms:.1f}"
+            return response
+
+        return wrapper
+    return decorator
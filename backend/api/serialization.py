@@ -0,0 +1,98 @@
+import json
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+NDJSON_MIMETYPES = (NDJSON_MIMETYPE, 'application/ndjson')
+
+
+def dumps(obj):
+    """Serialize an object to a compact JSON string, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), default=str)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that routes jsonify() through orjson when it is installed."""
+
+    def dumps(self, obj, **kwargs):
+        # orjson does not support the stdlib keyword arguments (indent, sort_keys),
+        # so only take the fast path for plain compact serialization
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=str).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+
+def init_json_provider(app):
+    """Install the fast JSON provider on the app if orjson is available."""
+    if orjson is not None:
+        app.json = FastJSONProvider(app)
+    return app
+
+
+def wants_ndjson(request):
+    """Return True if the client prefers newline-delimited JSON over a JSON document."""
+    # JSON comes first so that */* (curl, requests) keeps getting the JSON envelope
+    best = request.accept_mimetypes.best_match(('application/json',) + NDJSON_MIMETYPES)
+    return best in NDJSON_MIMETYPES
+
+
+def _ndjson_chunks(items, page):
+    """Yield each item as a single line of JSON, followed by a next_cursor record if there is one."""
+    for item in items:
+        yield dumps(item) + '\n'
+    next_cursor = getattr(page, 'next_cursor', None)
+    if next_cursor:
+        yield dumps({'next_cursor': next_cursor}) + '\n'
+
+
+def _json_array_chunks(items, page):
+    """Yield the standard success envelope with the items array written incrementally."""
+    yield '{"status":"success","data":{"status":"success","items":['
+    count = 0
+    for item in items:
+        yield ('' if count == 0 else ',') + dumps(item)
+        count += 1
+    next_cursor = dumps(getattr(page, 'next_cursor', None))
+    yield f'],"count":{count},"next_cursor":{next_cursor}}}}}'
+
+
+def stream_items(items, ndjson=False):
+    """
+    Build a streaming response from an item iterator.
+
+    The first item is pulled eagerly so that setup failures (missing
+    credentials, unreachable bucket) raise before any bytes are sent and can
+    still be reported with a proper error status.
+
+    If the iterable exposes a `next_cursor` attribute (see ContentPage), it is
+    read after the last item and written at the end of the stream.
+
+    Args:
+        items (iterable): Iterable yielding JSON-serializable items
+        ndjson (bool): Emit NDJSON instead of a chunked JSON array
+
+    Returns:
+        Response: Streaming Flask response
+    """
+    page = items
+    items = iter(page)
+    first = next(items, None)
+
+    def primed():
+        if first is not None:
+            yield first
+        yield from items
+
+    if ndjson:
+        body, mimetype = _ndjson_chunks(primed(), page), NDJSON_MIMETYPE
+    else:
+        body, mimetype = _json_array_chunks(primed(), page), 'application/json'
+
+    return Response(stream_with_context(body), mimetype=mimetype)
@@ -1,7 +1,9 @@
 import os
 from flask import Flask, jsonify
 from flask_cors import CORS
-from api.routes import register_routes
+from api.routes import register_routes, readiness_monitor
+from api.serialization import init_json_provider
+from api.compression import init_compression
 from config.config import init_config
 
 def create_app():
@@ -11,6 +13,10 @@ def create_app():
     # Initialize configuration
     init_config(app)
     
+    # Use the fast JSON encoder when available and negotiate compression
+    init_json_provider(app)
+    init_compression(app)
+    
     # Enable CORS
     CORS(app)
     
@@ -22,6 +28,12 @@ def create_app():
         """Endpoint for health checks."""
         return jsonify({"status": "healthy"})
     
+    @app.route('/ready', methods=['GET'])
+    def readiness_check():
+        """Endpoint for readiness checks, reporting cached dependency probes."""
+        status = readiness_monitor.status()
+        return jsonify(status), 200 if status['ready'] else 503
+    
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,27 @@
+import argparse
+import json
+from app import create_app
+from api import routes
+
+
+def main():
+    """Compact old day partitions into bundles; meant to run periodically, e.g. from cron."""
+    parser = argparse.ArgumentParser(description='Roll old day partitions into compressed bundles.')
+    parser.add_argument('--older-than-days', type=int, default=30,
+                        help='Only compact partitions at least this many days old (default: 30)')
+    parser.add_argument('--content-type', default=None,
+                        help='Only compact this content type')
+    args = parser.parse_args()
+
+    app = create_app()
+    if not hasattr(routes.storage_manager, 'compact_partitions'):
+        print(json.dumps({'status': 'error', 'error': 'The configured storage backend has no day partitions'}))
+        return
+
+    with app.app_context():
+        result = routes.storage_manager.compact_partitions(args.older_than_days, args.content_type)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
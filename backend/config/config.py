@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 def init_config(app):
@@ -21,12 +22,99 @@ def init_config(app):
         # S3 configuration (for local development, this can be mocked)
         S3_BUCKET=os.environ.get("S3_BUCKET", "content-generation-local"),
         
+        # Storage backend: local, s3 or sqlite (USE_S3=true selects s3 when unset)
+        STORAGE_BACKEND=os.environ.get(
+            "STORAGE_BACKEND", "s3" if os.environ.get("USE_S3", "false").lower() == "true" else "local"
+        ).lower(),
+        SQLITE_STORAGE_PATH=os.environ.get("SQLITE_STORAGE_PATH", os.path.join(os.getcwd(), 'state', 'content.db')),
+        SQLITE_GROUP_COMMIT_SIZE=int(os.environ.get("SQLITE_GROUP_COMMIT_SIZE", 256)),
+        
+        # Store content bodies once under their hash (content-addressed storage)
+        STORAGE_DEDUP=os.environ.get("STORAGE_DEDUP", "false").lower() == "true",
+        
+        # Local disk tier in front of S3 (0 bytes disables it)
+        STORAGE_CACHE_DIR=os.environ.get("STORAGE_CACHE_DIR", os.path.join(os.getcwd(), 'storage-cache')),
+        STORAGE_CACHE_MAX_BYTES=int(os.environ.get("STORAGE_CACHE_MAX_BYTES", 0)),
+        STORAGE_CACHE_POLICY=os.environ.get("STORAGE_CACHE_POLICY", "lru"),
+        
+        # Per-day manifests for S3 date-range listing
+        STORAGE_MANIFESTS=os.environ.get("STORAGE_MANIFESTS", "true").lower() == "true",
+        MANIFEST_BATCH_SIZE=int(os.environ.get("MANIFEST_BATCH_SIZE", 50)),
+        MANIFEST_FLUSH_INTERVAL=float(os.environ.get("MANIFEST_FLUSH_INTERVAL", 5)),
+        MANIFEST_MAX_SEGMENTS=int(os.environ.get("MANIFEST_MAX_SEGMENTS", 8)),
+        
+        # Bulk export (listing page size and S3 documents fetched ahead in parallel)
+        EXPORT_PAGE_SIZE=int(os.environ.get("EXPORT_PAGE_SIZE", 200)),
+        EXPORT_PREFETCH=int(os.environ.get("EXPORT_PREFETCH", 8)),
+        
         # Content generation settings
         MAX_TOKENS=int(os.environ.get("MAX_TOKENS", 1000)),
         TEMPERATURE=float(os.environ.get("TEMPERATURE", 0.7)),
+        LONG_FORM_MAX_CONCURRENCY=int(os.environ.get("LONG_FORM_MAX_CONCURRENCY", 8)),
+        
+        # Record or replay upstream completion calls (UPSTREAM_CASSETTE_MODE=record|replay)
+        UPSTREAM_CASSETTE_MODE=os.environ.get("UPSTREAM_CASSETTE_MODE") or None,
+        UPSTREAM_CASSETTE_PATH=os.environ.get("UPSTREAM_CASSETTE_PATH", os.path.join(os.getcwd(), 'state', 'cassettes')),
+        UPSTREAM_REPLAY_LATENCY_SCALE=float(os.environ.get("UPSTREAM_REPLAY_LATENCY_SCALE", 1.0)),
+        
+        # Token budgeting before upstream calls (context windows as JSON overrides, e.g. {"gpt-4": 8192})
+        TOKEN_BUDGET_ENABLED=os.environ.get("TOKEN_BUDGET_ENABLED", "true").lower() == "true",
+        MODEL_CONTEXT_WINDOWS=json.loads(os.environ.get("MODEL_CONTEXT_WINDOWS", "{}")),
+        TEMPLATE_VAR_MAX_TOKENS=int(os.environ.get("TEMPLATE_VAR_MAX_TOKENS", 750)),
+        TEMPLATE_VAR_POLICY=os.environ.get("TEMPLATE_VAR_POLICY", "summarize"),
+        MIN_COMPLETION_TOKENS=int(os.environ.get("MIN_COMPLETION_TOKENS", 64)),
+        
+        # Model routing policy overrides (JSON, see models/routing_model.py)
+        MODEL_ROUTING_POLICY=json.loads(os.environ.get("MODEL_ROUTING_POLICY", "{}")),
+        
+        # Token usage ledger (app state lives under state/, outside the content root that listings walk)
+        USAGE_DB_PATH=os.environ.get("USAGE_DB_PATH", os.path.join(os.getcwd(), 'state', 'usage.db')),
+        USAGE_FLUSH_INTERVAL=float(os.environ.get("USAGE_FLUSH_INTERVAL", 30)),
+        
+        # Idempotency-Key handling for generation and save endpoints
+        IDEMPOTENCY_DB_PATH=os.environ.get("IDEMPOTENCY_DB_PATH", os.path.join(os.getcwd(), 'state', 'idempotency.db')),
+        IDEMPOTENCY_TTL=float(os.environ.get("IDEMPOTENCY_TTL", 86400)),
+        IDEMPOTENCY_WAIT_TIMEOUT=float(os.environ.get("IDEMPOTENCY_WAIT_TIMEOUT", 120)),
+        
+        # Fair-share scheduling of generation work (lane caps, queue bounds and tenant weights as JSON)
+        SCHEDULER_LANES=json.loads(os.environ.get("SCHEDULER_LANES", '{"interactive": 6, "bulk": 2}')),
+        TENANT_WEIGHTS=json.loads(os.environ.get("TENANT_WEIGHTS", "{}")),
+        SCHEDULER_MAX_QUEUE=json.loads(os.environ.get("SCHEDULER_MAX_QUEUE", '{"interactive": 6, "bulk": 2}')),
+        SCHEDULER_QUEUE_TIMEOUT=float(os.environ.get("SCHEDULER_QUEUE_TIMEOUT", 120)),
+        
+        # Adaptive admission control for generation requests
+        ADMISSION_INITIAL_LIMIT=float(os.environ.get("ADMISSION_INITIAL_LIMIT", 20)),
+        ADMISSION_MIN_LIMIT=float(os.environ.get("ADMISSION_MIN_LIMIT", 2)),
+        ADMISSION_MAX_LIMIT=float(os.environ.get("ADMISSION_MAX_LIMIT", 200)),
+        ADMISSION_LATENCY_TOLERANCE=float(os.environ.get("ADMISSION_LATENCY_TOLERANCE", 2.0)),
+        # Threads per gunicorn worker (keep in sync with --threads); caps the admission limit
+        WORKER_THREADS=int(os.environ.get("WORKER_THREADS", 16)),
+        
+        # Response compression (for deployments not behind the nginx gzip block)
+        COMPRESS_RESPONSES=os.environ.get("COMPRESS_RESPONSES", "false").lower() == "true",
+        COMPRESS_LEVEL=int(os.environ.get("COMPRESS_LEVEL", 6)),
+        COMPRESS_MIN_SIZE=int(os.environ.get("COMPRESS_MIN_SIZE", 500)),
+        
+        # Structured JSON logging through a background writer thread
+        LOG_STRUCTURED=os.environ.get("LOG_STRUCTURED", "true").lower() == "true",
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        LOG_FILE=os.environ.get("LOG_FILE"),
+        LOG_QUEUE_SIZE=int(os.environ.get("LOG_QUEUE_SIZE", 10000)),
+        LOG_SUCCESS_SAMPLE_RATE=float(os.environ.get("LOG_SUCCESS_SAMPLE_RATE", 1.0)),
+        LOG_PROMPT_POLICY=os.environ.get("LOG_PROMPT_POLICY", "redact"),
+        LOG_PROMPT_CHARS=int(os.environ.get("LOG_PROMPT_CHARS", 100)),
+        LOG_MAX_FIELD_CHARS=int(os.environ.get("LOG_MAX_FIELD_CHARS", 1000)),
+        
+        # Readiness probes (upstream API, S3, storage directory) and start-up warm-up
+        READINESS_INTERVAL=float(os.environ.get("READINESS_INTERVAL", 30)),
+        READINESS_WARM_UP_TIMEOUT=float(os.environ.get("READINESS_WARM_UP_TIMEOUT", 10)),
+        READINESS_PROBE_TIMEOUT=float(os.environ.get("READINESS_PROBE_TIMEOUT", 5)),
         
         # Security settings
         SECRET_KEY=os.environ.get("SECRET_KEY", os.urandom(24).hex())
     )
+    
+    if app.config['LONG_FORM_MAX_CONCURRENCY'] < 1:
+        raise ValueError("LONG_FORM_MAX_CONCURRENCY must be at least 1")
 
     return app.config
@@ -0,0 +1,124 @@
+import math
+import time
+import threading
+
+# The limit only grows while in-flight work reaches this share of it; an idle
+# limit says nothing about whether more concurrency would be served well
+UTILIZATION_THRESHOLD = 0.8
+
+
+class AdmissionController:
+    """
+    Adaptive concurrency limit for generation requests.
+
+    The limit follows an AIMD rule driven by a latency gradient: a fast EWMA of
+    request latency is compared against a slow EWMA baseline. While the fast
+    average stays within `tolerance` times the baseline and in-flight work is
+    close to the limit, every completion raises the limit by 1/limit (about +1
+    per limit's worth of requests), up to `max_limit` (at most the worker's
+    thread count, which bounds what a worker can hold anyway); when latency
+    inflates past the tolerance or a request hits upstream congestion, the
+    limit is cut multiplicatively, at most once per `backoff_interval`. Requests arriving
+    while in-flight work is at the limit are rejected immediately with a
+    Retry-After estimate instead of piling up in the gunicorn and nginx queues.
+    """
+
+    def __init__(self, initial_limit=20, min_limit=2, max_limit=200, tolerance=2.0,
+                 decrease_factor=0.7, backoff_interval=1.0):
+        """
+        Initialize the controller.
+
+        Args:
+            initial_limit (float): Starting concurrency limit
+            min_limit (float): Lowest the limit may fall
+            max_limit (float): Highest the limit may grow
+            tolerance (float): Allowed ratio of recent to baseline latency
+            decrease_factor (float): Multiplier applied to the limit on overload
+            backoff_interval (float): Minimum seconds between decreases
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.decrease_factor = decrease_factor
+        self.backoff_interval = backoff_interval
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.short_latency_ms = None
+        self.long_latency_ms = None
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._counters = {'admitted': 0, 'rejected': 0, 'increases': 0, 'decreases': 0}
+
+    def init_app(self, app):
+        """Configure the limits from the app config, capped at the worker's thread count."""
+        self.min_limit = app.config.get('ADMISSION_MIN_LIMIT', self.min_limit)
+        self.max_limit = app.config.get('ADMISSION_MAX_LIMIT', self.max_limit)
+        if app.config.get('WORKER_THREADS'):
+            self.max_limit = min(self.max_limit, app.config['WORKER_THREADS'])
+        self.tolerance = app.config.get('ADMISSION_LATENCY_TOLERANCE', self.tolerance)
+        self.limit = min(float(app.config.get('ADMISSION_INITIAL_LIMIT', self.limit)), self.max_limit)
+
+    def try_acquire(self):
+        """
+        Admit a request if in-flight work is below the current limit.
+
+        Returns:
+            tuple: (admitted, retry_after) where retry_after is in seconds when rejected
+        """
+        with self._lock:
+            if self.in_flight < math.floor(self.limit):
+                self.in_flight += 1
+                self._counters['admitted'] += 1
+                return True, None
+
+            self._counters['rejected'] += 1
+            return False, self._retry_after()
+
+    def _retry_after(self):
+        """Estimate when capacity frees up: one recent latency per limit's worth of excess work."""
+        latency_s = (self.short_latency_ms or 1000) / 1000
+        excess = self.in_flight - math.floor(self.limit) + 1
+        return max(1, min(60, math.ceil(latency_s * excess / max(self.limit, 1))))
+
+    def release(self, latency_ms, error=False):
+        """
+        Finish an admitted request and adapt the limit.
+
+        Args:
+            latency_ms (float): Time the request took, including queueing
+            error (bool): Whether the request hit upstream congestion (timeout or overload)
+        """
+        with self._lock:
+            utilized = self.in_flight >= self.limit * UTILIZATION_THRESHOLD
+            self.in_flight -= 1
+
+            if self.short_latency_ms is None:
+                self.short_latency_ms = self.long_latency_ms = latency_ms
+            elif not error:
+                self.short_latency_ms += 0.2 * (latency_ms - self.short_latency_ms)
+                self.long_latency_ms += 0.01 * (latency_ms - self.long_latency_ms)
+
+            overloaded = error or self.short_latency_ms > self.tolerance * self.long_latency_ms
+            now = time.monotonic()
+
+            if overloaded:
+                if now - self._last_decrease >= self.backoff_interval:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self._counters['decreases'] += 1
+            elif utilized and self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self._counters['increases'] += 1
+
+    def stats(self):
+        """Return the current limit, in-flight count, latency averages and decision counters."""
+        with self._lock:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'latency_ms': {
+                    'recent': round(self.short_latency_ms, 1) if self.short_latency_ms is not None else None,
+                    'baseline': round(self.long_latency_ms, 1) if self.long_latency_ms is not None else None
+                },
+                **self._counters
+            }
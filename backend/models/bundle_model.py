@@ -0,0 +1,82 @@
+import gzip
+import json
+import struct
+
+# A bundle holds one day partition as individually gzipped members followed by
+# a gzipped JSON index and a fixed-size footer pointing at the index:
+#
+#   [member 0][member 1]...[member n][index][footer: magic, index offset, index length]
+#
+# Every member can be decompressed on its own, so a single object is read
+# with one ranged read once the index is known.
+BUNDLE_SUFFIX = '.bundle'
+BUNDLE_MAGIC = b'CGBNDL01'
+BUNDLE_FOOTER = struct.Struct('>8sQQ')
+
+
+def bundle_key_for(key):
+    """
+    Return the bundle key that would hold a content key.
+
+    'blog/2024/01/02/<uuid>.json' is archived in 'blog/2024/01/02.bundle'.
+    Returns None for keys outside the content_type/YYYY/MM/DD layout.
+    """
+    parts = key.split('/')
+    if len(parts) != 5 or not parts[4].endswith('.json'):
+        return None
+    return '/'.join(parts[:4]) + BUNDLE_SUFFIX
+
+
+def build_bundle(members):
+    """
+    Build a bundle from (key, body, last_modified) tuples.
+
+    Returns:
+        bytes: The encoded bundle
+    """
+    chunks = []
+    entries = {}
+    offset = 0
+
+    for key, body, last_modified in members:
+        compressed = gzip.compress(body, compresslevel=6)
+        entries[key] = [offset, len(compressed), len(body), last_modified]
+        chunks.append(compressed)
+        offset += len(compressed)
+
+    index = gzip.compress(json.dumps({'version': 1, 'entries': entries}, separators=(',', ':')).encode('utf-8'))
+    chunks.append(index)
+    chunks.append(BUNDLE_FOOTER.pack(BUNDLE_MAGIC, offset, len(index)))
+    return b''.join(chunks)
+
+
+def parse_footer(data):
+    """
+    Parse a bundle footer.
+
+    Returns:
+        tuple: (index offset, index length)
+    """
+    magic, index_offset, index_length = BUNDLE_FOOTER.unpack(data)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError('Not a content bundle')
+    return index_offset, index_length
+
+
+def parse_index(data):
+    """
+    Parse a bundle index.
+
+    Returns:
+        dict: Content key to {'offset', 'length', 'size', 'last_modified'}
+    """
+    index = json.loads(gzip.decompress(data))
+    return {
+        key: {'offset': offset, 'length': length, 'size': size, 'last_modified': last_modified}
+        for key, (offset, length, size, last_modified) in index['entries'].items()
+    }
+
+
+def decode_member(data):
+    """Decompress a single bundle member."""
+    return gzip.decompress(data)
@@ -0,0 +1,254 @@
+import os
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+
+
+class DiskCache:
+    """
+    Byte-bounded local disk tier shared by all workers on the host.
+
+    Object bodies are files named after the hash of their key; a WAL-mode
+    SQLite index next to them records size, last access and hit count for
+    each entry plus shared hit/miss/eviction counters, so the cache survives
+    restarts and every gunicorn worker sees the same state. The total size
+    is kept as a running counter maintained by triggers on the index, so a
+    write only takes the index's write lock when it pushes the cache over its
+    budget. Writes are atomic renames and evictions run in an immediate
+    transaction, so a reader either gets a complete file or a miss.
+    """
+
+    POLICIES = ('lru', 'lfu')
+
+    def __init__(self, cache_dir=None, max_bytes=0, policy='lru'):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory holding cached bodies and the index
+            max_bytes (int): Maximum total size of cached bodies; 0 disables the cache
+            policy (str): Eviction policy, 'lru' or 'lfu'
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self._local = threading.local()
+
+    def init_app(self, app):
+        """Configure the cache from the app config and create its index."""
+        self.cache_dir = app.config.get('STORAGE_CACHE_DIR') or self.cache_dir
+        self.max_bytes = app.config.get('STORAGE_CACHE_MAX_BYTES', self.max_bytes)
+        self.policy = app.config.get('STORAGE_CACHE_POLICY', self.policy)
+        self._local = threading.local()
+
+        if self.policy not in self.POLICIES:
+            raise ValueError(f"Unknown cache policy: {self.policy}")
+
+        if not self.enabled:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        conn = self._connect()
+        conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_modified TEXT,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            '''
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+        conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.executemany(
+            'INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)',
+            [('hits',), ('misses',), ('evictions',), ('evicted_bytes',)]
+        )
+
+        # Keep the total size as a running counter; an index created before the
+        # counter existed is summed once, in the same transaction as the triggers
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                '''
+                CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries BEGIN
+                    UPDATE counters SET value = value + new.size WHERE name = 'bytes';
+                END
+                '''
+            )
+            conn.execute(
+                '''
+                CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries BEGIN
+                    UPDATE counters SET value = value + new.size - old.size WHERE name = 'bytes';
+                END
+                '''
+            )
+            conn.execute(
+                '''
+                CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries BEGIN
+                    UPDATE counters SET value = value - old.size WHERE name = 'bytes';
+                END
+                '''
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO counters (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries"
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @property
+    def enabled(self):
+        """Return whether the cache is configured."""
+        return bool(self.cache_dir and self.max_bytes)
+
+    def _connect(self):
+        """Return this thread's connection to the index, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.cache_dir, 'index.db'), timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _path(self, key):
+        """Return the file path of a cached key."""
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _count(self, conn, name, amount=1):
+        """Increment a shared counter."""
+        conn.execute('UPDATE counters SET value = value + ? WHERE name = ?', (amount, name))
+
+    def _total_bytes(self, conn):
+        """Return the running total size of cached bodies."""
+        return conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+
+    def get(self, key):
+        """
+        Read a key from the cache.
+
+        Returns:
+            tuple: (body bytes, last_modified) on a hit, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        conn = self._connect()
+        row = conn.execute('SELECT last_modified FROM entries WHERE key = ?', (key,)).fetchone()
+
+        body = None
+        if row is not None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+        if body is None:
+            self._count(conn, 'misses')
+            return None
+
+        conn.execute('BEGIN')
+        conn.execute('UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?', (time.time(), key))
+        self._count(conn, 'hits')
+        conn.execute('COMMIT')
+        return body, row[0]
+
+    def put(self, key, body, last_modified=None):
+        """Store a key in the cache, evicting other entries if the byte budget is exceeded."""
+        if not self.enabled or len(body) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        conn = self._connect()
+        conn.execute(
+            '''
+            INSERT INTO entries (key, size, last_modified, last_access, hits) VALUES (?, ?, ?, ?, 0)
+            ON CONFLICT (key) DO UPDATE SET
+                size = excluded.size, last_modified = excluded.last_modified, last_access = excluded.last_access
+            ''',
+            (key, len(body), last_modified, time.time())
+        )
+        self._evict(conn)
+
+    def _evict(self, conn):
+        """Evict entries by the configured policy until the cache fits its byte budget."""
+        # Most writes fit the budget; check without taking the write lock
+        if self._total_bytes(conn) <= self.max_bytes:
+            return
+
+        order = 'last_access' if self.policy == 'lru' else 'hits, last_access'
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            total = self._total_bytes(conn)
+            if total <= self.max_bytes:
+                conn.execute('COMMIT')
+                return
+
+            victims = []
+            for key, size in conn.execute(f'SELECT key, size FROM entries ORDER BY {order}'):
+                if total <= self.max_bytes:
+                    break
+                victims.append((key, size))
+                total -= size
+
+            conn.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key, _ in victims])
+            self._count(conn, 'evictions', len(victims))
+            self._count(conn, 'evicted_bytes', sum(size for _, size in victims))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        for key, _ in victims:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, key):
+        """Remove a key from the cache."""
+        if not self.enabled:
+            return
+        self._connect().execute('DELETE FROM entries WHERE key = ?', (key,))
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        """Return size, entry count, hit ratio and eviction counters."""
+        if not self.enabled:
+            return {'enabled': False}
+
+        conn = self._connect()
+        counters = dict(conn.execute('SELECT name, value FROM counters'))
+        entries = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        lookups = counters['hits'] + counters['misses']
+
+        return {
+            'enabled': True,
+            'policy': self.policy,
+            'max_bytes': self.max_bytes,
+            'size_bytes': counters['bytes'],
+            'entries': entries,
+            'hits': counters['hits'],
+            'misses': counters['misses'],
+            'hit_ratio': round(counters['hits'] / lookups, 3) if lookups else 0.0,
+            'evictions': counters['evictions'],
+            'evicted_bytes': counters['evicted_bytes']
+        }
@@ -0,0 +1,154 @@
+import os
+import glob
+import gzip
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import deque
+from types import SimpleNamespace
+
+CASSETTE_MODES = ('record', 'replay')
+CASSETTE_SUFFIX = '.ndjson.gz'
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when no recording matches an upstream request."""
+
+
+class ReplayedUpstreamError(Exception):
+    """An upstream error served back from a recording."""
+
+
+def request_key(request):
+    """Return the matching key of an upstream request: a hash of its canonical JSON."""
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+def _to_namespace(value):
+    """Turn a recorded response back into an object with attribute access, like the client's models."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+def read_cassette(path):
+    """Yield every recorded call in a cassette directory, oldest segment first."""
+    for segment in sorted(glob.glob(os.path.join(path, f"*{CASSETTE_SUFFIX}"))):
+        with gzip.open(segment, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            except EOFError:
+                # A segment still being written (or cut off by a crash) ends early
+                continue
+
+
+class Cassette:
+    """
+    Record or replay the upstream completion calls of ContentGenerator.
+
+    A cassette is a directory of gzipped NDJSON segments, one per recording
+    worker process. Each line holds the request, the response, its latency,
+    the wall-clock start time and the content type/template it was made for.
+    In replay mode requests are matched on a hash of their parameters and
+    served after the recorded latency multiplied by latency_scale; repeated
+    identical requests are served their recordings in order, cycling when
+    exhausted. Recorded upstream errors are raised again.
+    """
+
+    def __init__(self, path=None, mode=None, latency_scale=1.0):
+        """
+        Initialize the cassette.
+
+        Args:
+            path (str): Cassette directory
+            mode (str): 'record', 'replay' or None to pass calls through
+            latency_scale (float): Multiplier applied to recorded latencies on replay (0 serves instantly)
+        """
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._writer = None
+        self._recordings = None
+
+    def init_app(self, app):
+        """Configure the cassette from the app config and load recordings in replay mode."""
+        self.path = app.config.get('UPSTREAM_CASSETTE_PATH') or self.path
+        self.mode = app.config.get('UPSTREAM_CASSETTE_MODE') or self.mode
+        self.latency_scale = app.config.get('UPSTREAM_REPLAY_LATENCY_SCALE', self.latency_scale)
+
+        if self.mode and self.mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {self.mode}")
+
+        if self.mode == 'replay':
+            self._recordings = {}
+            for call in read_cassette(self.path):
+                self._recordings.setdefault(call['key'], deque()).append(call)
+
+    @property
+    def recording(self):
+        return self.mode == 'record'
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def record(self, request, context, latency_ms, started_at, response=None, error=None):
+        """Append one upstream call to this process's segment."""
+        if response is not None:
+            response = response.model_dump() if hasattr(response, 'model_dump') else response.dict()
+
+        line = json.dumps({
+            'key': request_key(request),
+            'ts': round(started_at, 3),
+            'latency_ms': round(latency_ms, 1),
+            'context': context,
+            'request': request,
+            'response': response,
+            'error': error
+        }, separators=(',', ':'), default=str)
+
+        with self._lock:
+            if self._writer is None:
+                os.makedirs(self.path, exist_ok=True)
+                segment = os.path.join(self.path, f"{int(time.time())}-{os.getpid()}{CASSETTE_SUFFIX}")
+                self._writer = gzip.open(segment, 'at', encoding='utf-8')
+                atexit.register(self.close)
+            self._writer.write(line + '\n')
+            self._writer.flush()
+
+    def replay(self, request):
+        """
+        Serve the recording of a request after its (scaled) recorded latency.
+
+        Returns:
+            object: The recorded response with attribute access
+        """
+        key = request_key(request)
+        with self._lock:
+            calls = self._recordings.get(key)
+            if not calls:
+                raise CassetteMiss(f"No recording for upstream request {key}")
+            call = calls.popleft()
+            calls.append(call)
+
+        if self.latency_scale:
+            time.sleep(call['latency_ms'] * self.latency_scale / 1000)
+
+        if call['error'] is not None:
+            raise ReplayedUpstreamError(call['error'])
+        return _to_namespace(call['response'])
+
+    def close(self):
+        """Finish the gzip stream of this process's segment."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
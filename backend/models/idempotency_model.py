@@ -0,0 +1,145 @@
+import os
+import time
+import sqlite3
+import threading
+
+
+class IdempotencyStore:
+    """
+    Host-wide store of idempotent request outcomes.
+
+    Keys live in a WAL-mode SQLite file so every gunicorn worker on the host
+    sees them. The first request for a key inserts a pending row and runs;
+    concurrent duplicates poll until the row completes and then replay the
+    stored response. Rows expire after the configured TTL.
+    """
+
+    # Outcomes returned by begin()
+    NEW = 'new'
+    REPLAY = 'replay'
+    MISMATCH = 'mismatch'
+    IN_PROGRESS = 'in_progress'
+
+    def __init__(self, db_path=None, ttl=86400, wait_timeout=120, lock_timeout=300):
+        """
+        Initialize the store.
+
+        Args:
+            db_path (str): Path to the SQLite file (set from config in init_app)
+            ttl (float): Seconds a completed response is kept for replay
+            wait_timeout (float): Seconds a duplicate waits for the original to finish
+            lock_timeout (float): Seconds after which a pending row is treated as abandoned
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.lock_timeout = lock_timeout
+        self._calls = 0
+        self._local = threading.local()
+
+    def init_app(self, app):
+        """Configure the store from the app config and create its schema."""
+        self.db_path = app.config.get('IDEMPOTENCY_DB_PATH') or self.db_path
+        self.ttl = app.config.get('IDEMPOTENCY_TTL', self.ttl)
+        self.wait_timeout = app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', self.wait_timeout)
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS idempotency (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    status_code INTEGER,
+                    body BLOB,
+                    created REAL NOT NULL,
+                    expires REAL NOT NULL
+                )
+                '''
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires)')
+
+    def _connect(self):
+        """Return this thread's connection to the store, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _purge_expired(self, conn, now):
+        """Delete expired rows; runs on every hundredth call to keep the table small."""
+        self._calls += 1
+        if self._calls % 100 == 0:
+            conn.execute('DELETE FROM idempotency WHERE expires < ?', (now,))
+
+    def begin(self, key, fingerprint):
+        """
+        Claim a key or wait for the request that already holds it.
+
+        Args:
+            key (str): Scoped idempotency key
+            fingerprint (str): Hash of the request payload
+
+        Returns:
+            tuple: (outcome, stored) where stored is (status_code, body) for REPLAY
+        """
+        conn = self._connect()
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.05
+
+        while True:
+            now = time.time()
+            self._purge_expired(conn, now)
+
+            # Claim the key unless a live row exists; expired or abandoned rows are replaced
+            claimed = conn.execute(
+                '''
+                INSERT INTO idempotency (key, fingerprint, state, created, expires)
+                VALUES (?, ?, 'pending', ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    fingerprint = excluded.fingerprint, state = 'pending',
+                    status_code = NULL, body = NULL,
+                    created = excluded.created, expires = excluded.expires
+                WHERE idempotency.expires < ?
+                   OR (idempotency.state = 'pending' AND idempotency.created < ?)
+                ''',
+                (key, fingerprint, now, now + self.ttl, now, now - self.lock_timeout)
+            ).rowcount
+            if claimed:
+                return self.NEW, None
+
+            row = conn.execute(
+                'SELECT fingerprint, state, status_code, body FROM idempotency WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                # The holder released the key between our insert and select; try again
+                continue
+
+            stored_fingerprint, state, status_code, body = row
+            if stored_fingerprint != fingerprint:
+                return self.MISMATCH, None
+            if state == 'done':
+                return self.REPLAY, (status_code, body)
+
+            if time.monotonic() >= deadline:
+                return self.IN_PROGRESS, None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    def complete(self, key, status_code, body):
+        """Store the final response for a claimed key."""
+        self._connect().execute(
+            "UPDATE idempotency SET state = 'done', status_code = ?, body = ? WHERE key = ?",
+            (status_code, body, key)
+        )
+
+    def release(self, key):
+        """Drop a claimed key without storing a response so a retry can run again."""
+        self._connect().execute("DELETE FROM idempotency WHERE key = ? AND state = 'pending'", (key,))
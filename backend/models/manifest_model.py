@@ -0,0 +1,300 @@
+import gzip
+import json
+import time
+import uuid
+import atexit
+import threading
+from datetime import datetime, timedelta
+
+
+class ManifestIndex:
+    """
+    Per-day manifests of saved content for S3 storage.
+
+    Saves append a small entry (key, size, timestamp, preview) to an in-memory
+    buffer; a background thread writes each day's buffered entries as a new
+    immutable segment under '_manifests/<content_type>/YYYY/MM/DD/'. Writers
+    never modify shared objects, so concurrent workers cannot lose each
+    other's entries. Deletes append a tombstone for the key. Reading a day
+    costs one LIST plus a GET per segment; after a flush, the flusher merges
+    any day left with more than `max_segments` segments into one, so a busy
+    day stays at a few GETs and reads never write. rebuild() collapses a day
+    into a single segment from a bucket scan.
+    """
+
+    PREFIX = '_manifests'
+    PREVIEW_LENGTH = 120
+
+    def __init__(self, batch_size=50, flush_interval=5, max_segments=8):
+        """
+        Initialize the manifest index.
+
+        Args:
+            batch_size (int): Buffered entries that trigger an early flush
+            flush_interval (float): Seconds between background flushes
+            max_segments (int): Segments a day may have before the flusher merges them
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_segments = max_segments
+        self.enabled = False
+        self.app = None
+        self.storage = None
+        self._buffer = {}
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app, storage):
+        """Configure the index, bind it to a storage manager and start the flusher."""
+        self.app = app
+        self.storage = storage
+        self.enabled = app.config.get('STORAGE_MANIFESTS', True)
+        self.batch_size = app.config.get('MANIFEST_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('MANIFEST_FLUSH_INTERVAL', self.flush_interval)
+        self.max_segments = app.config.get('MANIFEST_MAX_SEGMENTS', self.max_segments)
+
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='manifest-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _day_prefix(self, content_type, day_parts):
+        """Return the key prefix holding one day's manifest segments."""
+        return f"{self.PREFIX}/{content_type}/{'/'.join(day_parts)}/"
+
+    def _child_names(self, prefix):
+        """Return the names of the 'directories' directly under a prefix, newest first."""
+        paginator = self.storage._get_s3_client().get_paginator('list_objects_v2')
+        names = set()
+        for page in paginator.paginate(Bucket=self.app.config['S3_BUCKET'], Prefix=prefix, Delimiter='/'):
+            for common in page.get('CommonPrefixes', []):
+                names.add(common['Prefix'][len(prefix):].rstrip('/'))
+        return sorted(names, reverse=True)
+
+    def days(self, content_type, start_day, end_day):
+        """
+        Yield the days of a range that have manifest segments, newest first.
+
+        Walks the YYYY/MM/DD levels with delimiter listings, one LIST per year
+        and month in range, so days without content cost nothing. The walk is
+        lazy: a page that fills up early never lists older months.
+
+        Args:
+            content_type (str): Content type of the manifests
+            start_day (list): First day of the range as [YYYY, MM, DD]
+            end_day (list): Last day of the range as [YYYY, MM, DD]
+        """
+        def walk(parts):
+            level = len(parts)
+            if level == 3:
+                yield parts
+                return
+
+            prefix = f"{self.PREFIX}/{content_type}/{''.join(part + '/' for part in parts)}"
+            for name in self._child_names(prefix):
+                sub_parts = parts + [name]
+                if sub_parts > end_day[:level + 1] or sub_parts < start_day[:level + 1]:
+                    continue
+                yield from walk(sub_parts)
+
+        yield from walk([])
+
+    @classmethod
+    def make_entry(cls, key, size, content_data, timestamp):
+        """Build a manifest entry for a saved object."""
+        content = content_data.get('content') if isinstance(content_data, dict) else None
+        preview = content[:cls.PREVIEW_LENGTH] if isinstance(content, str) else ''
+        return {'key': key, 'size': size, 'timestamp': timestamp, 'preview': preview}
+
+    @staticmethod
+    def make_tombstone(key):
+        """Build a manifest entry recording that a key was deleted."""
+        return {'key': key, 'deleted': True}
+
+    def append(self, content_type, day_parts, entry):
+        """Buffer an entry for a day; flushing happens in the background."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._buffer.setdefault((content_type, tuple(day_parts)), []).append(entry)
+            self._buffered += 1
+            if self._buffered >= self.batch_size:
+                self._wake.set()
+
+    def buffered(self, content_type, day_parts):
+        """Return this worker's unflushed entries for a day."""
+        with self._lock:
+            return list(self._buffer.get((content_type, tuple(day_parts)), ()))
+
+    def _write_segment(self, content_type, day_parts, entries, label='segment'):
+        """Write entries as a new gzipped NDJSON segment for a day."""
+        body = gzip.compress(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries).encode('utf-8'))
+        key = f"{self._day_prefix(content_type, day_parts)}{int(time.time() * 1000)}-{label}-{uuid.uuid4().hex[:8]}.ndjson.gz"
+        self.storage._put_object(key, body)
+
+    def flush(self):
+        """Write every buffered day as one segment each; failed days are kept for the next flush."""
+        if self.storage is None:
+            return
+
+        with self._lock:
+            batch, self._buffer, self._buffered = self._buffer, {}, 0
+
+        for (content_type, day_parts), entries in batch.items():
+            try:
+                with self.app.app_context():
+                    self._write_segment(content_type, day_parts, entries)
+            except Exception as e:
+                self.app.logger.error(f"Manifest Flush Error: {str(e)}")
+                with self._lock:
+                    self._buffer.setdefault((content_type, day_parts), [])[:0] = entries
+                    self._buffered += len(entries)
+                continue
+
+            with self.app.app_context():
+                self._compact_day(content_type, day_parts)
+
+    def _run(self):
+        """Background loop flushing on the interval or when the batch size is reached."""
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write any remaining entries."""
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+    def read_day(self, content_type, day_parts):
+        """
+        Return all live manifest entries for a day, newest key first, deduplicated by key.
+
+        Includes this worker's unflushed entries. Keys are never reused, so a
+        tombstone hides its key whichever segment it is in.
+        """
+        segment_keys = list(self.storage._list_keys(self._day_prefix(content_type, day_parts)))
+        entries, deleted = self._read_segments(segment_keys)
+
+        for entry in self.buffered(content_type, day_parts):
+            if entry.get('deleted'):
+                deleted.add(entry['key'])
+            else:
+                entries[entry['key']] = entry
+        return [entries[key] for key in sorted(entries, reverse=True) if key not in deleted]
+
+    def _read_segments(self, segment_keys):
+        """
+        Read manifest segments.
+
+        Returns:
+            tuple: (entries by key, set of deleted keys)
+        """
+        entries = {}
+        deleted = set()
+        for segment_key in segment_keys:
+            for line in gzip.decompress(self.storage._get_object(segment_key)).decode('utf-8').splitlines():
+                if line:
+                    entry = json.loads(line)
+                    if entry.get('deleted'):
+                        deleted.add(entry['key'])
+                    else:
+                        entries[entry['key']] = entry
+        return entries, deleted
+
+    def _compact_day(self, content_type, day_parts):
+        """
+        Replace a day's segments with one merged segment once it has more than `max_segments`.
+
+        Runs on the flusher after it writes to the day. Tombstones are kept,
+        since another worker may still flush an entry for a deleted key;
+        segments written after the listing are left in place. Merging is
+        best-effort: on failure the day is merged again after a later flush.
+        """
+        try:
+            segment_keys = list(self.storage._list_keys(self._day_prefix(content_type, day_parts)))
+            if len(segment_keys) <= self.max_segments:
+                return
+
+            entries, deleted = self._read_segments(segment_keys)
+            merged = [entry for key, entry in sorted(entries.items()) if key not in deleted]
+            merged += [self.make_tombstone(key) for key in sorted(deleted)]
+            self._write_segment(content_type, day_parts, merged, label='merged')
+            for segment_key in segment_keys:
+                self.storage._delete_object(segment_key)
+        except Exception as e:
+            self.app.logger.error(f"Manifest Merge Error: {str(e)}")
+
+    def is_recent(self, day_parts):
+        """Return whether a day may still have entries buffered in other workers."""
+        horizon = (datetime.now() - timedelta(seconds=self.flush_interval * 2)).strftime('%Y/%m/%d')
+        return '/'.join(day_parts) >= horizon
+
+    def content_types(self):
+        """Return the content types that have manifests."""
+        s3 = self.storage._get_s3_client()
+        paginator = s3.get_paginator('list_objects_v2')
+        types = set()
+        for page in paginator.paginate(Bucket=self.app.config['S3_BUCKET'], Prefix=f"{self.PREFIX}/", Delimiter='/'):
+            for common in page.get('CommonPrefixes', []):
+                types.add(common['Prefix'][len(self.PREFIX) + 1:].rstrip('/'))
+        return sorted(types)
+
+    def _entry_from_body(self, key, body, last_modified):
+        """Build a manifest entry from a stored object, resolving content-addressed references."""
+        try:
+            content_data = self.storage._resolve_reference(json.loads(body))
+        except ValueError:
+            content_data = {}
+        storage_metadata = content_data.get('storage_metadata', {}) if isinstance(content_data, dict) else {}
+        return self.make_entry(
+            key, storage_metadata.get('content_size', len(body)), content_data,
+            storage_metadata.get('timestamp', last_modified)
+        )
+
+    def rebuild(self, content_type=None):
+        """
+        Rebuild manifests from a bucket scan.
+
+        Each day with stored content gets one consolidated segment; the
+        segments that existed before the scan are deleted afterwards, while
+        segments written concurrently are kept (readers deduplicate by key).
+
+        Returns:
+            dict: Number of days and entries written
+        """
+        days = 0
+        entries_written = 0
+
+        for bundle_key, day, objects in self.storage._iter_partitions(content_type, include_archived=True):
+            day_type = bundle_key.split('/')[0]
+            day_parts = day.split('-')
+            prefix = self._day_prefix(day_type, day_parts)
+            old_segments = list(self.storage._list_keys(prefix))
+
+            entries = []
+            for key, last_modified in objects:
+                body = self.storage._get_object(key, cacheable=False)
+                entries.append(self._entry_from_body(key, body, last_modified))
+
+            # Archived objects are listed from their bundle index
+            archived = self.storage._read_bundle_index(bundle_key) or {}
+            loose_keys = {key for key, _ in objects}
+            for key, entry in archived.items():
+                if key not in loose_keys:
+                    body, _ = self.storage._read_from_bundle(key)
+                    entries.append(self._entry_from_body(key, body, entry['last_modified']))
+
+            self._write_segment(day_type, day_parts, entries, label='rebuild')
+            for segment_key in old_segments:
+                self.storage._delete_object(segment_key)
+
+            days += 1
+            entries_written += len(entries)
+
+        return {'status': 'success', 'days': days, 'entries': entries_written}
@@ -1,29 +1,86 @@
+import re
 import json
+import time
 import openai
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
 from datetime import datetime
+from models.token_budget_model import BudgetError
+
+# Prompts for long-form generation: a short outline first, then every part in parallel
+LONG_FORM_TEMPLATES = {
+    'blog_post': {
+        'outline': "Create an outline for a blog post about {topic} with the following keywords: {keywords}. "
+                   "The tone should be {tone} and the target audience is {audience}. "
+                   "Reply with a catchy title on the first line followed by exactly {num_sections} "
+                   "section headings, one per line, without numbering or any other text.",
+        'introduction': "Write the introduction for a blog post titled \"{title}\" about {topic}. "
+                        "The tone should be {tone} and the target audience is {audience}. "
+                        "The post covers these sections: {outline}. Write only the introduction.",
+        'section': "Write the section \"{heading}\" of a blog post titled \"{title}\" about {topic}, "
+                   "using these keywords where relevant: {keywords}. The tone should be {tone} and the "
+                   "target audience is {audience}. The full outline is: {outline}. "
+                   "Write only the body of this section, without repeating its heading.",
+        'conclusion': "Write the conclusion for a blog post titled \"{title}\" about {topic}. "
+                      "The tone should be {tone} and the target audience is {audience}. "
+                      "The post covered these sections: {outline}. Write only the conclusion."
+    }
+}
+
+# Outlines are short, so the first call gets a small completion budget
+OUTLINE_MAX_TOKENS = 200
+
+# Upper bound on candidates requested from a single completion call
+MAX_CANDIDATES = 10
+
+# Upstream failures that signal congestion (timeouts, rate limits, overloaded servers)
+CONGESTION_ERRORS = (openai.APITimeoutError, openai.RateLimitError, openai.InternalServerError)
 
 class ContentGenerator:
     """Class responsible for generating content using OpenAI's GPT models."""
     
-    def __init__(self, api_key=None):
-        """Initialize with optional API key override."""
+    def __init__(self, api_key=None, usage_ledger=None, router=None, cassette=None, token_budget=None):
+        """Initialize with optional API key override, usage ledger, model router, record/replay cassette and token budget."""
         self.api_key = api_key
+        self.usage_ledger = usage_ledger
+        self.router = router
+        self.cassette = cassette
+        self.token_budget = token_budget
+        self.client = None
+        self._client_key = None
     
     def setup_client(self):
-        """Set up the OpenAI API client."""
+        """Set up the OpenAI API client, reusing it (and its connection pool) while the key is unchanged."""
         if self.api_key:
             api_key = self.api_key
         else:
             api_key = current_app.config['OPENAI_API_KEY']
+        
+        if self.client is not None and self._client_key == api_key:
+            return
             
         # Initialize the client only with required parameters to avoid proxy issues
         self.client = openai.OpenAI(
             api_key=api_key,
             # No additional parameters that might cause conflicts
         )
+        self._client_key = api_key
+    
+    def ping(self, timeout=5):
+        """
+        Check that the upstream API is reachable and accepts the key, warming the client's connection pool.
         
-    def generate_content(self, prompt, content_type, options=None):
+        Returns:
+            dict: Details of the check; raises if the API cannot be reached
+        """
+        if self.cassette and self.cassette.replaying:
+            return {'mode': 'replay'}
+        
+        self.setup_client()
+        self.client.with_options(timeout=timeout, max_retries=0).models.list()
+        return {}
+        
+    def generate_content(self, prompt, content_type, options=None, template_name=None):
         """
         Generate content using OpenAI's API.
         
@@ -31,6 +88,7 @@ class ContentGenerator:
             prompt (str): The prompt to send to the model
             content_type (str): Type of content being generated (blog, ad, etc.)
             options (dict): Additional generation options
+            template_name (str): Template the prompt was built from, if any
             
         Returns:
             dict: Generated content with metadata
@@ -39,7 +97,6 @@ class ContentGenerator:
         
         # Default options
         default_options = {
-            'model': 'gpt-4',
             'max_tokens': current_app.config.get('MAX_TOKENS', 1000),
             'temperature': current_app.config.get('TEMPERATURE', 0.7),
         }
@@ -48,48 +105,250 @@ class ContentGenerator:
         if options:
             default_options.update(options)
         
-        try:
-            response = self.client.chat.completions.create(
-                model=default_options['model'],
-                messages=[
-                    {"role": "system", "content": f"You are a professional content creator specializing in {content_type}."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=default_options['max_tokens'],
-                temperature=default_options['temperature']
-            )
-            
-            # Extract the generated content
-            content = response.choices[0].message.content
-            
-            # Create response with metadata
-            result = {
-                'content': content,
+        # Several candidates can be requested from one upstream call
+        n = default_options.get('n', 1)
+        if not isinstance(n, int) or not 1 <= n <= MAX_CANDIDATES:
+            return {
+                'error': f"Option 'n' must be an integer between 1 and {MAX_CANDIDATES}",
+                'rejected': True,
                 'metadata': {
-                    'content_type': content_type,
                     'timestamp': datetime.now().isoformat(),
-                    'model': default_options['model'],
-                    'prompt': prompt,
-                    'tokens': {
-                        'prompt': response.usage.prompt_tokens,
-                        'completion': response.usage.completion_tokens,
-                        'total': response.usage.total_tokens
-                    }
+                    'prompt': prompt
                 }
             }
+        
+        request_options = {}
+        if n > 1:
+            request_options['n'] = n
+            if default_options.get('rank'):
+                request_options['logprobs'] = True
+        
+        # An explicit model from the client wins; otherwise let the router decide
+        if default_options.get('model'):
+            routing = {'model': default_options['model'], 'reason': 'requested by client'}
+        elif self.router:
+            routing = self.router.choose(content_type, template_name, default_options['max_tokens'])
+        else:
+            routing = {'model': 'gpt-4', 'reason': 'default model'}
+        
+        model = routing['model']
+        tried = set()
+        upstream_error = None
+        messages = [
+            {"role": "system", "content": f"You are a professional content creator specializing in {content_type}."},
+            {"role": "user", "content": prompt}
+        ]
+        
+        while True:
+            tried.add(model)
             
-            return result
+            # Count the prompt locally and fit max_tokens to what is left of the context window
+            try:
+                budget = self.token_budget.fit(model, messages, default_options['max_tokens']) if self.token_budget else None
+            except BudgetError as e:
+                # A fallback that cannot take the prompt must not turn the upstream failure into a client error
+                if upstream_error:
+                    current_app.logger.error(f"OpenAI API Error: {upstream_error['error']} (fallback {model}: {str(e)})")
+                    return upstream_error
+                return {
+                    'error': str(e),
+                    'rejected': True,
+                    'metadata': {
+                        'timestamp': datetime.now().isoformat(),
+                        'model': model,
+                        'prompt': prompt
+                    }
+                }
             
-        except Exception as e:
-            error_msg = str(e)
-            current_app.logger.error(f"OpenAI API Error: {error_msg}")
-            return {
-                'error': error_msg,
-                'metadata': {
-                    'timestamp': datetime.now().isoformat(),
-                    'prompt': prompt
+            started = time.perf_counter()
+            
+            try:
+                response = self._complete(
+                    {
+                        'model': model,
+                        'messages': messages,
+                        'max_tokens': budget['max_tokens'] if budget else default_options['max_tokens'],
+                        'temperature': default_options['temperature'],
+                        **request_options
+                    },
+                    {'content_type': content_type, 'template': template_name}
+                )
+                break
+                
+            except Exception as e:
+                error_msg = str(e)
+                self._record_call(
+                    model, content_type, template_name,
+                    latency_ms=(time.perf_counter() - started) * 1000, error=True
+                )
+                
+                # Routed requests get one more attempt on the fallback model
+                fallback = None
+                if self.router and routing['reason'] != 'requested by client':
+                    fallback = self.router.fallback_for(model)
+                
+                upstream_error = {
+                    'error': error_msg,
+                    'overloaded': isinstance(e, CONGESTION_ERRORS),
+                    'metadata': {
+                        'timestamp': datetime.now().isoformat(),
+                        'prompt': prompt
+                    }
                 }
+                
+                if fallback and fallback not in tried:
+                    current_app.logger.warning(f"OpenAI API Error on {model}, falling back to {fallback}: {error_msg}")
+                    routing = {'model': fallback, 'reason': f"fallback from {model}: upstream error"}
+                    model = fallback
+                    continue
+                
+                current_app.logger.error(f"OpenAI API Error: {error_msg}")
+                return upstream_error
+        
+        latency_ms = (time.perf_counter() - started) * 1000
+        
+        # Extract the generated content
+        content = response.choices[0].message.content
+        tokens = {
+            'prompt': response.usage.prompt_tokens,
+            'completion': response.usage.completion_tokens,
+            'total': response.usage.total_tokens
+        }
+        
+        self._record_call(model, content_type, template_name, tokens, latency_ms)
+        
+        # Create response with metadata
+        result = {
+            'content': content,
+            'metadata': {
+                'content_type': content_type,
+                'timestamp': datetime.now().isoformat(),
+                'model': model,
+                'routing': routing,
+                'prompt': prompt,
+                'tokens': tokens
             }
+        }
+        
+        if template_name:
+            result['metadata']['template'] = template_name
+        
+        if budget:
+            result['metadata']['budget'] = budget
+        
+        if n > 1:
+            candidates = self._build_candidates(response.choices, tokens)
+            if default_options.get('rank'):
+                candidates = self._rank_candidates(candidates)
+            if default_options.get('dedupe'):
+                unique = self._dedupe_candidates(candidates)
+                result['metadata']['duplicates_removed'] = len(candidates) - len(unique)
+                candidates = unique
+            
+            result['content'] = candidates[0]['content']
+            result['candidates'] = candidates
+        
+        return result
+    
+    @staticmethod
+    def _build_candidates(choices, tokens):
+        """
+        Build one candidate per returned choice with its share of the call's token usage.
+        
+        The API only reports usage for the whole call, so the shared prompt
+        tokens are split evenly and completion tokens in proportion to each
+        candidate's length; the shares always add up to the reported totals.
+        """
+        contents = [choice.message.content or '' for choice in choices]
+        count = len(contents)
+        total_length = sum(len(content) for content in contents) or count
+        
+        candidates = []
+        completion_left = tokens['completion']
+        for index, (choice, content) in enumerate(zip(choices, contents)):
+            prompt_share = tokens['prompt'] // count + (1 if index < tokens['prompt'] % count else 0)
+            if index == count - 1:
+                completion_share = completion_left
+            else:
+                completion_share = tokens['completion'] * (len(content) or 1) // total_length
+                completion_left -= completion_share
+            
+            logprobs = getattr(getattr(choice, 'logprobs', None), 'content', None)
+            candidates.append({
+                'index': choice.index,
+                'content': content,
+                'finish_reason': choice.finish_reason,
+                'score': round(sum(token.logprob for token in logprobs) / len(logprobs), 4) if logprobs else None,
+                'tokens': {
+                    'prompt': prompt_share,
+                    'completion': completion_share,
+                    'total': prompt_share + completion_share
+                }
+            })
+        
+        return candidates
+    
+    @staticmethod
+    def _rank_candidates(candidates):
+        """Order candidates by completeness, then by mean token log-probability (most confident first)."""
+        return sorted(
+            candidates,
+            key=lambda candidate: (
+                candidate['finish_reason'] != 'stop',
+                -candidate['score'] if candidate['score'] is not None else float('inf')
+            )
+        )
+    
+    @staticmethod
+    def _dedupe_candidates(candidates):
+        """
+        Drop candidates whose text matches an earlier one, ignoring case and whitespace.
+        
+        A dropped candidate's token share is added to the one it duplicates,
+        so the kept candidates still add up to the call's usage.
+        """
+        kept = {}
+        unique = []
+        for candidate in candidates:
+            normalized = ' '.join(candidate['content'].lower().split())
+            if normalized in kept:
+                tokens = kept[normalized]['tokens']
+                for name in tokens:
+                    tokens[name] += candidate['tokens'][name]
+                continue
+            kept[normalized] = candidate
+            unique.append(candidate)
+        return unique
+    
+    def _complete(self, request, context):
+        """
+        Make one upstream chat completion call, through the cassette when one is active.
+        
+        In record mode the call and its outcome are written to the cassette; in
+        replay mode the recorded response is served instead of calling the API.
+        """
+        if self.cassette and self.cassette.replaying:
+            return self.cassette.replay(request)
+        
+        if not (self.cassette and self.cassette.recording):
+            return self.client.chat.completions.create(**request)
+        
+        started_at, started = time.time(), time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(**request)
+        except Exception as e:
+            self.cassette.record(request, context, (time.perf_counter() - started) * 1000, started_at, error=str(e))
+            raise
+        
+        self.cassette.record(request, context, (time.perf_counter() - started) * 1000, started_at, response=response)
+        return response
+    
+    def _record_call(self, model, content_type, template_name, tokens=None, latency_ms=0.0, error=False):
+        """Report the outcome of an upstream call to the usage ledger and model router."""
+        if self.usage_ledger:
+            self.usage_ledger.record(model, content_type, template_name, tokens, latency_ms, error)
+        if self.router:
+            self.router.observe(model, latency_ms, error)
     
     def generate_with_template(self, template_name, template_vars, content_type, options=None):
         """
@@ -122,23 +381,192 @@ class ContentGenerator:
         if template_name not in templates:
             return {
                 'error': f"Template '{template_name}' not found",
+                'rejected': True,
                 'metadata': {
                     'timestamp': datetime.now().isoformat()
                 }
             }
         
+        options = dict(options) if options else {}
+        long_form = options.pop('long_form', False)
+        
+        if long_form and options.get('n', 1) != 1:
+            return {
+                'error': 'Long-form generation does not support multiple candidates',
+                'rejected': True,
+                'metadata': {
+                    'timestamp': datetime.now().isoformat(),
+                    'template': template_name
+                }
+            }
+        
+        if long_form and template_name not in LONG_FORM_TEMPLATES:
+            return {
+                'error': f"Template '{template_name}' does not support long-form generation",
+                'rejected': True,
+                'metadata': {
+                    'timestamp': datetime.now().isoformat(),
+                    'template': template_name
+                }
+            }
+        
+        # Shorten oversized variables (long feature lists...) before they reach the prompt
+        trimmed = []
+        if self.token_budget:
+            try:
+                template_vars, trimmed = self.token_budget.fit_template_vars(template_vars)
+            except BudgetError as e:
+                return {
+                    'error': str(e),
+                    'rejected': True,
+                    'metadata': {
+                        'timestamp': datetime.now().isoformat(),
+                        'template': template_name
+                    }
+                }
+        
         try:
             # Format the template with provided variables
             prompt = templates[template_name].format(**template_vars)
             
-            # Generate content with the formatted prompt
-            return self.generate_content(prompt, content_type, options)
+            if long_form:
+                result = self._generate_long_form(template_name, template_vars, content_type, options)
+            else:
+                # Generate content with the formatted prompt
+                result = self.generate_content(prompt, content_type, options, template_name=template_name)
+            
+            if trimmed and 'error' not in result:
+                result['metadata']['trimmed_vars'] = trimmed
+            return result
             
         except KeyError as e:
             return {
                 'error': f"Missing required template variable: {str(e)}",
+                'rejected': True,
                 'metadata': {
                     'timestamp': datetime.now().isoformat(),
                     'template': template_name
                 }
             }
+    
+    def _generate_long_form(self, template_name, template_vars, content_type, options):
+        """
+        Generate long-form content as an outline followed by concurrent part completions.
+        
+        The outline call is kept short; the introduction, every section and the
+        conclusion are then requested in parallel and assembled in order, so the
+        wall-clock time is close to the slowest single part rather than the sum.
+        
+        Args:
+            template_name (str): Name of a template in LONG_FORM_TEMPLATES
+            template_vars (dict): Variables to inject into the template
+            content_type (str): Type of content being generated
+            options (dict): Additional generation options applied to every part
+            
+        Returns:
+            dict: Assembled content with summed token usage and per-part metadata
+        """
+        prompts = LONG_FORM_TEMPLATES[template_name]
+        started = time.perf_counter()
+        
+        try:
+            num_sections = int(template_vars['num_sections'])
+        except (TypeError, ValueError):
+            num_sections = 0
+        if num_sections < 1:
+            return {
+                'error': "Template variable 'num_sections' must be a positive whole number",
+                'rejected': True,
+                'metadata': {
+                    'timestamp': datetime.now().isoformat(),
+                    'template': template_name
+                }
+            }
+        
+        # Step 1: a short outline with the title and section headings
+        outline_options = {**options, 'max_tokens': min(options.get('max_tokens', OUTLINE_MAX_TOKENS), OUTLINE_MAX_TOKENS)}
+        outline = self.generate_content(
+            prompts['outline'].format(**template_vars), content_type, outline_options, template_name=template_name
+        )
+        if 'error' in outline:
+            return outline
+        
+        # Strip list and heading markers only, so titles such as "5 Tips for Speed" keep their digits
+        lines = [re.sub(r'^\s*(?:\d+[.)]|[-*#]+)\s+', '', line).strip() for line in outline['content'].splitlines()]
+        lines = [line.strip('"') for line in lines if line]
+        if len(lines) < 2:
+            return {
+                'error': 'Could not parse an outline from the model response',
+                'metadata': {
+                    'timestamp': datetime.now().isoformat(),
+                    'template': template_name
+                }
+            }
+        
+        # The model may return more headings than asked for; never fan out beyond num_sections
+        title, headings = re.sub(r'^title:\s*', '', lines[0], flags=re.IGNORECASE), lines[1:num_sections + 1]
+        part_vars = {**template_vars, 'title': title, 'outline': '; '.join(headings)}
+        
+        # Step 2: every part in parallel, keeping their order for assembly
+        parts = [('introduction', None, prompts['introduction'].format(**part_vars))]
+        parts += [
+            ('section', heading, prompts['section'].format(heading=heading, **part_vars))
+            for heading in headings
+        ]
+        parts.append(('conclusion', None, prompts['conclusion'].format(**part_vars)))
+        
+        app = current_app._get_current_object()
+        
+        def generate_part(prompt):
+            with app.app_context():
+                return self.generate_content(prompt, content_type, options, template_name=template_name)
+        
+        max_workers = min(len(parts), app.config.get('LONG_FORM_MAX_CONCURRENCY', 8))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(generate_part, [prompt for _, _, prompt in parts]))
+        
+        failed = next((result for result in results if 'error' in result), None)
+        if failed:
+            return failed
+        
+        # Assemble in order and sum token usage across every call
+        sections = [f"# {title}", results[0]['content'].strip()]
+        for (kind, heading, _), result in zip(parts[1:-1], results[1:-1]):
+            sections.append(f"## {heading}\n\n{result['content'].strip()}")
+        sections.append(f"## Conclusion\n\n{results[-1]['content'].strip()}")
+        
+        all_results = [outline] + results
+        tokens = {
+            name: sum(result['metadata']['tokens'][name] for result in all_results)
+            for name in ('prompt', 'completion', 'total')
+        }
+        
+        # The first section speaks for the body (the introduction when there are no sections)
+        primary = results[1] if len(results) > 2 else results[0]
+        
+        return {
+            'content': '\n\n'.join(sections),
+            'metadata': {
+                'content_type': content_type,
+                'timestamp': datetime.now().isoformat(),
+                'model': primary['metadata']['model'],
+                'routing': primary['metadata']['routing'],
+                'template': template_name,
+                'long_form': True,
+                'title': title,
+                'sections': headings,
+                'prompt': outline['metadata']['prompt'],
+                'tokens': tokens,
+                'parts': [
+                    {
+                        'part': kind,
+                        'heading': heading,
+                        'model': result['metadata']['model'],
+                        'routing': result['metadata']['routing'],
+                        'tokens': result['metadata']['tokens']
+                    }
+                    for (kind, heading, _), result in zip([('outline', None, None)] + parts, all_results)
+                ],
+                'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+            }
+        }
@@ -0,0 +1,126 @@
+import os
+import time
+import uuid
+import atexit
+import threading
+from datetime import datetime
+
+
+class ReadinessMonitor:
+    """
+    Background dependency probes for the readiness endpoint.
+
+    Probes for the upstream API, S3 (when it is the storage backend) and the
+    local storage directory run on a background thread every `interval`
+    seconds; requests only read the cached results, so /ready is cheap and
+    never waits on a slow dependency. The first round doubles as warm-up:
+    it builds the API and S3 clients and opens their connections, and
+    init_app waits for it (up to `warm_up_timeout`) so a new worker does not
+    take traffic with cold clients.
+    """
+
+    def __init__(self, interval=30, warm_up_timeout=10, probe_timeout=5):
+        """
+        Initialize the monitor.
+
+        Args:
+            interval (float): Seconds between probe rounds
+            warm_up_timeout (float): Seconds init_app waits for the first round (0 to not wait)
+            probe_timeout (float): Timeout for network probes
+        """
+        self.interval = interval
+        self.warm_up_timeout = warm_up_timeout
+        self.probe_timeout = probe_timeout
+        self.app = None
+        self.probes = {}
+        self._results = {}
+        self._lock = threading.Lock()
+        self._warmed_up = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app, generator, storage):
+        """Register the probes for the configured dependencies, start the prober and wait for warm-up."""
+        self.app = app
+        self.interval = app.config.get('READINESS_INTERVAL', self.interval)
+        self.warm_up_timeout = app.config.get('READINESS_WARM_UP_TIMEOUT', self.warm_up_timeout)
+        self.probe_timeout = app.config.get('READINESS_PROBE_TIMEOUT', self.probe_timeout)
+
+        self.probes = {'upstream': lambda: generator.ping(self.probe_timeout)}
+        if getattr(storage, 'use_s3', False):
+            self.probes['s3'] = storage.ping
+        self.probes['storage_dir'] = lambda: self._probe_directory(storage._storage_dir())
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='readiness-probes', daemon=True)
+            self._thread.start()
+            atexit.register(self._stop.set)
+
+        if self.warm_up_timeout:
+            self._warmed_up.wait(self.warm_up_timeout)
+
+    @staticmethod
+    def _probe_directory(path):
+        """Check that a directory exists and is writable."""
+        os.makedirs(path, exist_ok=True)
+        probe_path = os.path.join(path, f".ready-{uuid.uuid4().hex}")
+        with open(probe_path, 'w') as f:
+            f.write('ok')
+        os.remove(probe_path)
+        return {'path': path}
+
+    def run_probes(self):
+        """Run every probe once and cache the outcome and latency."""
+        for name, probe in self.probes.items():
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    details = probe() or {}
+                result = {'ok': True, **details}
+            except Exception as e:
+                result = {'ok': False, 'error': str(e)}
+
+            result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            result['checked_at'] = datetime.now().isoformat()
+            result['_checked'] = time.monotonic()
+
+            with self._lock:
+                self._results[name] = result
+
+    def _run(self):
+        """Background loop running the probes every interval."""
+        while not self._stop.is_set():
+            self.run_probes()
+            self._warmed_up.set()
+            self._stop.wait(self.interval)
+
+    def status(self):
+        """
+        Return the cached probe results.
+
+        A result older than three intervals counts as failed, so a stuck
+        prober cannot keep reporting ready.
+
+        Returns:
+            dict: Overall readiness, warm-up state and per-dependency checks
+        """
+        now = time.monotonic()
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+
+        checks = {}
+        for name in self.probes:
+            result = results.get(name)
+            if result is None:
+                checks[name] = {'ok': False, 'error': 'not checked yet'}
+                continue
+            if now - result.pop('_checked') > self.interval * 3:
+                result.update(ok=False, error='stale result')
+            checks[name] = result
+
+        warmed_up = self._warmed_up.is_set()
+        return {
+            'ready': warmed_up and all(check['ok'] for check in checks.values()),
+            'warmed_up': warmed_up,
+            'checks': checks
+        }
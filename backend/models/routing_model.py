@@ -0,0 +1,147 @@
+import time
+import threading
+from collections import deque
+
+# Default routing policy; any key can be overridden with MODEL_ROUTING_POLICY
+DEFAULT_ROUTING_POLICY = {
+    # Model used when no rule matches
+    'default_model': 'gpt-4',
+    # Faster model for short outputs
+    'fast_model': 'gpt-3.5-turbo',
+    # Requests asking for at most this many tokens go to the fast model
+    'fast_max_tokens': 300,
+    # Explicit model per template name or content type (templates take precedence)
+    'rules': {
+        'social_media': 'gpt-3.5-turbo',
+        'social': 'gpt-3.5-turbo',
+    },
+    # Model to fall back to when a model breaches its SLO or fails
+    'fallbacks': {
+        'gpt-4': 'gpt-3.5-turbo',
+    },
+    # Rolling p95 latency SLO per model, in milliseconds
+    'latency_slo_ms': {
+        'gpt-4': 20000,
+        'gpt-3.5-turbo': 8000,
+    },
+    # Rolling error rate above which a model is considered unhealthy
+    'max_error_rate': 0.25,
+    # Observations required before health checks apply
+    'min_samples': 10,
+    # Length of the rolling observation window, in seconds
+    'window_seconds': 300,
+}
+
+
+class ModelRouter:
+    """
+    Chooses the upstream model for a generation request.
+
+    The choice starts from the routing policy (template, content type and
+    requested max_tokens) and then follows the fallback chain while the
+    chosen model's rolling p95 latency or error rate breaches the policy.
+    Observations are kept per worker in a bounded rolling window.
+    """
+
+    def __init__(self, policy=None, max_samples=500):
+        """
+        Initialize the router.
+
+        Args:
+            policy (dict): Overrides for DEFAULT_ROUTING_POLICY
+            max_samples (int): Maximum observations kept per model
+        """
+        self.policy = {**DEFAULT_ROUTING_POLICY, **(policy or {})}
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Apply the routing policy overrides from the app config."""
+        self.policy = {**DEFAULT_ROUTING_POLICY, **(app.config.get('MODEL_ROUTING_POLICY') or {})}
+
+    def observe(self, model, latency_ms, error=False):
+        """Record the outcome of an upstream call to a model."""
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self.max_samples)
+            samples.append((time.monotonic(), latency_ms, error))
+
+    def stats(self, model):
+        """
+        Return rolling statistics for a model.
+
+        Returns:
+            dict: Sample count, p95 latency (ms) and error rate within the window
+        """
+        cutoff = time.monotonic() - self.policy['window_seconds']
+        with self._lock:
+            samples = [sample for sample in self._samples.get(model, ()) if sample[0] >= cutoff]
+
+        if not samples:
+            return {'samples': 0, 'p95_ms': None, 'error_rate': 0.0}
+
+        latencies = sorted(latency for _, latency, error in samples if not error)
+        errors = sum(1 for _, _, error in samples if error)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None
+
+        return {
+            'samples': len(samples),
+            'p95_ms': round(p95, 1) if p95 is not None else None,
+            'error_rate': round(errors / len(samples), 3)
+        }
+
+    def _breach(self, model):
+        """Return a description of how a model breaches the policy, or None if it is healthy."""
+        stats = self.stats(model)
+        if stats['samples'] < self.policy['min_samples']:
+            return None
+
+        slo = self.policy['latency_slo_ms'].get(model)
+        if slo is not None and stats['p95_ms'] is not None and stats['p95_ms'] > slo:
+            return f"p95 latency {stats['p95_ms']}ms exceeds SLO {slo}ms"
+        if stats['error_rate'] > self.policy['max_error_rate']:
+            return f"error rate {stats['error_rate']} exceeds {self.policy['max_error_rate']}"
+        return None
+
+    def fallback_for(self, model):
+        """Return the configured fallback model for a model, if any."""
+        return self.policy['fallbacks'].get(model)
+
+    def choose(self, content_type=None, template_name=None, max_tokens=None):
+        """
+        Choose a model for a request.
+
+        Args:
+            content_type (str): Type of content being generated
+            template_name (str): Template the prompt was built from, if any
+            max_tokens (int): Requested completion budget
+
+        Returns:
+            dict: The chosen 'model' and the 'reason' for choosing it
+        """
+        rules = self.policy['rules']
+
+        if template_name and template_name in rules:
+            model, reason = rules[template_name], f"rule for template '{template_name}'"
+        elif content_type and content_type in rules:
+            model, reason = rules[content_type], f"rule for content type '{content_type}'"
+        elif max_tokens is not None and max_tokens <= self.policy['fast_max_tokens']:
+            model, reason = self.policy['fast_model'], f"max_tokens {max_tokens} <= {self.policy['fast_max_tokens']}"
+        else:
+            model, reason = self.policy['default_model'], 'default model'
+
+        # Follow the fallback chain while the chosen model is unhealthy
+        visited = {model}
+        breach = self._breach(model)
+        while breach:
+            fallback = self.fallback_for(model)
+            if not fallback or fallback in visited:
+                break
+            reason = f"fallback from {model}: {breach}"
+            model = fallback
+            visited.add(model)
+            breach = self._breach(model)
+
+        return {'model': model, 'reason': reason}
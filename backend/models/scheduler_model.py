@@ -0,0 +1,221 @@
+import math
+import time
+import heapq
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Default lanes and their concurrency caps; override with SCHEDULER_LANES
+DEFAULT_LANES = {
+    'interactive': 6,
+    'bulk': 2,
+}
+
+# Default number of requests allowed to wait per lane; override with SCHEDULER_MAX_QUEUE.
+# Every queued request holds a worker thread, so worker threads should cover the
+# lane caps plus these queues (16 with the defaults) or waiting bulk work can
+# occupy the threads interactive requests need to reach the scheduler at all.
+DEFAULT_MAX_QUEUE = {
+    'interactive': 6,
+    'bulk': 2,
+}
+
+# Tenant finish tags kept per lane before tags that no longer matter are pruned
+TENANT_FINISH_PRUNE_SIZE = 1024
+
+
+class QueueTimeout(Exception):
+    """Raised when a request waits longer than the queue timeout for a slot."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(QueueTimeout):
+    """Raised when a lane's queue is already at its bound and the request is turned away."""
+
+
+class _Lane:
+    """A priority lane with its own concurrency cap and weighted fair queue."""
+
+    def __init__(self, name, concurrency, max_queue):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.queue = []
+        self.virtual_time = 0.0
+        self.tenant_finish = {}
+        self.waits_ms = deque(maxlen=500)
+        self.service_ms = deque(maxlen=100)
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+
+class FairScheduler:
+    """
+    Weighted fair-share scheduler for generation work.
+
+    Each lane (interactive, bulk) has its own concurrency cap, so bulk jobs can
+    never take slots reserved for interactive users. Within a lane, waiting
+    requests are ordered by weighted fair queuing on the tenant: every request
+    gets a virtual finish tag of max(lane virtual time, tenant's last tag) +
+    1 / weight, and the smallest tag runs next. A tenant flooding the queue
+    therefore only delays its own requests.
+
+    Each lane also bounds how many requests may wait: past `max_queue` a
+    request is turned away at once rather than holding a worker thread while
+    it queues. Tenant finish tags are pruned once they fall behind the lane's
+    virtual time, where they no longer affect ordering.
+    """
+
+    def __init__(self, lanes=None, tenant_weights=None, queue_timeout=120, max_queue=None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            lanes (dict): Lane name to concurrency cap
+            tenant_weights (dict): Tenant id to weight (defaults to 1)
+            queue_timeout (float): Seconds a request may wait for a slot
+            max_queue (dict): Lane name to the number of requests allowed to wait
+        """
+        self.queue_timeout = queue_timeout
+        self.tenant_weights = tenant_weights or {}
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._configure(lanes or DEFAULT_LANES, max_queue or DEFAULT_MAX_QUEUE)
+
+    def init_app(self, app):
+        """Configure lanes, queue bounds, tenant weights and the queue timeout from the app config."""
+        self.queue_timeout = app.config.get('SCHEDULER_QUEUE_TIMEOUT', self.queue_timeout)
+        self.tenant_weights = app.config.get('TENANT_WEIGHTS') or {}
+        self._configure(
+            app.config.get('SCHEDULER_LANES') or DEFAULT_LANES,
+            app.config.get('SCHEDULER_MAX_QUEUE') or DEFAULT_MAX_QUEUE
+        )
+
+    def _configure(self, lanes, max_queue):
+        """(Re)create the lanes with the given concurrency caps and queue bounds."""
+        with self._lock:
+            self.lanes = {
+                name: _Lane(name, int(concurrency), int(max_queue.get(name, concurrency)))
+                for name, concurrency in lanes.items()
+            }
+
+    @staticmethod
+    def _retry_after(lane):
+        """Estimate when a slot frees up: recent service time per slot's worth of queued work. Caller holds the lock."""
+        service_s = (sum(lane.service_ms) / len(lane.service_ms) / 1000) if lane.service_ms else 1.0
+        return max(1, min(60, math.ceil(service_s * (lane.waiting + 1) / max(lane.concurrency, 1))))
+
+    @staticmethod
+    def _prune_tenants(lane):
+        """Drop finish tags at or behind the lane's virtual time; max() ignores them anyway. Caller holds the lock."""
+        if len(lane.tenant_finish) > TENANT_FINISH_PRUNE_SIZE:
+            lane.tenant_finish = {
+                tenant: tag for tenant, tag in lane.tenant_finish.items() if tag > lane.virtual_time
+            }
+
+    def lane_for(self, priority):
+        """Return the lane name for a requested priority, defaulting to interactive."""
+        return priority if priority in self.lanes else 'interactive'
+
+    def _dispatch(self, lane):
+        """Wake queued waiters in tag order while the lane has free slots. Caller holds the lock."""
+        while lane.queue and lane.active < lane.concurrency:
+            tag, _, waiter = heapq.heappop(lane.queue)
+            if waiter['cancelled']:
+                continue
+            lane.waiting -= 1
+            lane.active += 1
+            lane.virtual_time = tag
+            waiter['granted'] = True
+            waiter['event'].set()
+
+    @contextmanager
+    def slot(self, tenant, lane_name='interactive'):
+        """
+        Hold a slot in a lane for the duration of the block.
+
+        Args:
+            tenant (str): Tenant id (API key) the work is charged to
+            lane_name (str): Lane to run in
+
+        Yields:
+            float: Time spent waiting for the slot, in milliseconds
+
+        Raises:
+            QueueFull: If the lane has no free slot and its queue is at the bound
+            QueueTimeout: If no slot frees up within the queue timeout
+        """
+        lane = self.lanes[lane_name]
+        waiter = {'event': threading.Event(), 'granted': False, 'cancelled': False}
+        enqueued = time.monotonic()
+
+        with self._lock:
+            if lane.active >= lane.concurrency and lane.waiting >= lane.max_queue:
+                lane.rejected += 1
+                raise QueueFull(f"The {lane_name} queue is full", self._retry_after(lane))
+
+            self._prune_tenants(lane)
+            weight = float(self.tenant_weights.get(tenant, 1.0)) or 1.0
+            tag = max(lane.virtual_time, lane.tenant_finish.get(tenant, 0.0)) + 1.0 / weight
+            lane.tenant_finish[tenant] = tag
+            self._seq += 1
+            heapq.heappush(lane.queue, (tag, self._seq, waiter))
+            lane.waiting += 1
+            self._dispatch(lane)
+
+        if not waiter['event'].wait(self.queue_timeout):
+            with self._lock:
+                if not waiter['granted']:
+                    waiter['cancelled'] = True
+                    lane.waiting -= 1
+                    lane.timeouts += 1
+                    raise QueueTimeout(
+                        f"No {lane_name} capacity within {self.queue_timeout}s", self._retry_after(lane)
+                    )
+
+        started = time.monotonic()
+        wait_ms = (started - enqueued) * 1000
+        with self._lock:
+            lane.waits_ms.append(wait_ms)
+
+        try:
+            yield wait_ms
+        finally:
+            with self._lock:
+                lane.service_ms.append((time.monotonic() - started) * 1000)
+                lane.active -= 1
+                lane.completed += 1
+                self._dispatch(lane)
+
+    def stats(self):
+        """
+        Return queue depth, concurrency and wait time statistics per lane.
+
+        Returns:
+            dict: Lane name to statistics
+        """
+        with self._lock:
+            result = {}
+            for name, lane in self.lanes.items():
+                waits = sorted(lane.waits_ms)
+                result[name] = {
+                    'concurrency': lane.concurrency,
+                    'max_queue': lane.max_queue,
+                    'active': lane.active,
+                    'queue_depth': lane.waiting,
+                    'completed': lane.completed,
+                    'timeouts': lane.timeouts,
+                    'rejected': lane.rejected,
+                    'wait_ms': {
+                        'avg': round(sum(waits) / len(waits), 1) if waits else 0.0,
+                        'p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0,
+                        'max': round(waits[-1], 1) if waits else 0.0
+                    }
+                }
+            return result
@@ -0,0 +1,310 @@
+import os
+import json
+import uuid
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from flask import current_app
+from models.storage_model import ContentPage, _encode_cursor, _decode_cursor
+
+
+class SQLiteStorageManager:
+    """
+    Content storage in a single WAL-mode SQLite database.
+
+    Documents keep the 'content_type/YYYY/MM/DD/<uuid>.json' keys of the file
+    backends so clients see no difference. Saves are handed to a writer
+    thread that commits everything queued in one transaction (group commit),
+    so concurrent requests share a single fsync. Listing reads an index on
+    (content_type, created, key) and pages with (created, key) cursors.
+    """
+
+    def __init__(self, db_path=None, batch_size=256):
+        """
+        Initialize the storage manager.
+
+        Args:
+            db_path (str): Path to the SQLite database (set from config in init_app)
+            batch_size (int): Maximum queued saves committed in one transaction
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.use_s3 = False
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = None
+
+    def init_app(self, app):
+        """Configure the database from the app config, create the schema and start the writer."""
+        self.db_path = app.config.get('SQLITE_STORAGE_PATH') or self.db_path
+        self.batch_size = app.config.get('SQLITE_GROUP_COMMIT_SIZE', self.batch_size)
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS documents (
+                key TEXT PRIMARY KEY,
+                content_type TEXT NOT NULL,
+                created TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                body TEXT NOT NULL
+            )
+            '''
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS documents_type_created ON documents (content_type, created, key)')
+        conn.execute('CREATE INDEX IF NOT EXISTS documents_created ON documents (created, key)')
+
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name='sqlite-group-commit', daemon=True)
+            self._writer.start()
+
+    def _connect(self):
+        """Return this thread's connection to the database, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _storage_dir(self):
+        """Return the directory holding the database."""
+        return os.path.dirname(os.path.abspath(self.db_path))
+
+    def _write_loop(self):
+        """Commit queued saves in batches: block for the first, then take whatever else is waiting."""
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO documents (key, content_type, created, size, body) VALUES (?, ?, ?, ?, ?)',
+                    [row for rows, _ in batch for row in rows]
+                )
+                conn.execute('COMMIT')
+                error = None
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                error = e
+
+            for _, waiter in batch:
+                waiter['error'] = error
+                waiter['done'].set()
+
+    def _new_row(self, content_data, content_type):
+        """Build the documents row and storage metadata for a new save."""
+        now = datetime.now()
+        filepath = f"{content_type}/{now.strftime('%Y/%m/%d')}/{uuid.uuid4()}.json"
+        storage_metadata = {
+            'filepath': filepath,
+            'timestamp': now.isoformat(),
+            'version': '1.0'
+        }
+        body = json.dumps({**content_data, 'storage_metadata': storage_metadata}, separators=(',', ':'))
+        return (filepath, content_type, storage_metadata['timestamp'], len(body), body), storage_metadata
+
+    def _commit(self, rows):
+        """Queue rows for the writer thread and wait until they are committed together; raises on failure."""
+        waiter = {'done': threading.Event(), 'error': None}
+        self._queue.put((rows, waiter))
+        waiter['done'].wait()
+        if waiter['error'] is not None:
+            raise waiter['error']
+
+    def save_content(self, content_data, content_type):
+        """
+        Save content to the database.
+
+        Args:
+            content_data (dict): Content data to save
+            content_type (str): Type of content (blog, social, etc.)
+
+        Returns:
+            dict: Information about the saved content
+        """
+        return self.save_many([content_data], content_type)[0]
+
+    def save_many(self, contents, content_type):
+        """
+        Save several content items of the same type in a single commit.
+
+        Args:
+            contents (list): Content data dicts to save
+            content_type (str): Type of content (blog, social, etc.)
+
+        Returns:
+            list: save_content results, in input order
+        """
+        try:
+            prepared = [self._new_row(content_data, content_type) for content_data in contents]
+            self._commit([row for row, _ in prepared])
+
+            return [
+                {
+                    'status': 'success',
+                    'storage_type': 'sqlite',
+                    'location': storage_metadata['filepath'],
+                    'metadata': storage_metadata
+                }
+                for _, storage_metadata in prepared
+            ]
+
+        except Exception as e:
+            current_app.logger.error(f"SQLite Storage Error: {str(e)}")
+            return [{'status': 'error', 'error': str(e)} for _ in contents]
+
+    def retrieve_content(self, filepath, is_s3_path=None):
+        """
+        Retrieve content from the database.
+
+        Args:
+            filepath (str): Key of the content
+            is_s3_path (bool): Ignored; accepted for interface compatibility
+
+        Returns:
+            dict: Retrieved content or error information
+        """
+        try:
+            row = self._connect().execute(
+                'SELECT body, created, size FROM documents WHERE key = ?', (filepath,)
+            ).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"Content not found: {filepath}")
+
+            body, created, size = row
+            return {
+                'status': 'success',
+                'content': json.loads(body),
+                'metadata': {
+                    'last_modified': created,
+                    'size': size
+                }
+            }
+
+        except Exception as e:
+            current_app.logger.error(f"SQLite Retrieval Error: {str(e)}")
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
+
+    def delete_content(self, filepath):
+        """
+        Delete content from the database.
+
+        Args:
+            filepath (str): Key of the content
+
+        Returns:
+            dict: Deletion result or error information
+        """
+        try:
+            deleted = self._connect().execute('DELETE FROM documents WHERE key = ?', (filepath,)).rowcount
+            if not deleted:
+                raise FileNotFoundError(f"Content not found: {filepath}")
+
+            return {
+                'status': 'success',
+                'deleted': filepath,
+                'body_deleted': True
+            }
+
+        except Exception as e:
+            current_app.logger.error(f"SQLite Deletion Error: {str(e)}")
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
+
+    def iter_content(self, content_type=None, start_date=None, end_date=None, limit=100, cursor=None):
+        """
+        Lazily list one page of content, newest first, optionally filtered by type and date range.
+
+        An invalid cursor raises ValueError immediately.
+
+        Returns:
+            ContentPage: Iterable of content items; `next_cursor` is set once exhausted
+        """
+        state = _decode_cursor(cursor)
+        if state and not isinstance(state.get('spos'), list):
+            raise ValueError("Cursor does not belong to SQLite storage")
+
+        page = ContentPage()
+        page.items = self._iter_page(page, content_type, start_date, end_date, limit, state and state['spos'])
+        return page
+
+    def _iter_page(self, page, content_type, start_date, end_date, limit, position=None):
+        """Yield one page of rows using the (content_type, created, key) index."""
+        conditions = []
+        params = []
+        if content_type:
+            conditions.append('content_type = ?')
+            params.append(content_type)
+        if start_date:
+            conditions.append('created >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('created <= ?')
+            params.append(end_date)
+        if position:
+            conditions.append('(created, key) < (?, ?)')
+            params.extend(position)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        # Fetch one extra row to know whether another page exists
+        rows = self._connect().execute(
+            f'SELECT key, created, size FROM documents {where} ORDER BY created DESC, key DESC LIMIT ?',
+            params + [limit + 1]
+        ).fetchall()
+
+        for key, created, size in rows[:limit]:
+            page.position = {'spos': [created, key]}
+            yield {
+                'key': key,
+                'location': key,
+                'last_modified': created,
+                'size': size
+            }
+
+        if len(rows) > limit:
+            page.next_cursor = _encode_cursor(page.position)
+
+    def list_content(self, content_type=None, start_date=None, end_date=None, limit=100, cursor=None):
+        """
+        List available content, optionally filtered by type and date range.
+
+        Returns:
+            dict: List of content items or error information
+        """
+        try:
+            page = self.iter_content(content_type, start_date, end_date, limit, cursor)
+            items = list(page)
+
+            return {
+                'status': 'success',
+                'items': items,
+                'count': len(items),
+                'next_cursor': page.next_cursor
+            }
+
+        except Exception as e:
+            current_app.logger.error(f"SQLite Listing Error: {str(e)}")
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
@@ -1,32 +1,121 @@
 import os
 import json
 import uuid
+import fcntl
+import base64
+import heapq
+import hashlib
+import itertools
 import boto3
-from datetime import datetime
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from flask import current_app
 from pathlib import Path
+from models.bundle_model import (
+    BUNDLE_SUFFIX, BUNDLE_FOOTER, bundle_key_for, build_bundle, parse_footer, parse_index, decode_member
+)
+
+# Internal keys (_objects/, _refs/, _manifests/) start with '_' (0x5F), which sorts before
+# every lowercase content type; S3 listings jump past this key to skip the whole range
+INTERNAL_KEYS_END = '_\U0010ffff'
+
+def _encode_cursor(state):
+    """Encode listing state as an opaque, URL-safe cursor string."""
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor; raises ValueError if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict):
+        raise ValueError("Invalid cursor")
+    return state
+
+
+class ContentPage:
+    """
+    One page of listed content; `next_cursor` is populated once the items are exhausted.
+    
+    `position` is the cursor state just after the item most recently yielded,
+    so a consumer can resume from any item rather than only from page ends.
+    """
+    
+    def __init__(self):
+        self.items = iter(())
+        self.next_cursor = None
+        self.position = None
+    
+    def __iter__(self):
+        return self.items
+
 
 class StorageManager:
     """Manager for content storage, supporting both local filesystem and S3 storage."""
     
-    def __init__(self, use_s3=False):
+    # Prefixes for content-addressed bodies and their reference markers
+    OBJECTS_PREFIX = '_objects'
+    REFS_PREFIX = '_refs'
+    
+    # Number of bundle indexes kept in memory per worker
+    BUNDLE_INDEX_CACHE_SIZE = 64
+    
+    def __init__(self, use_s3=False, dedup=None, cache=None, manifests=None):
         """
         Initialize the storage manager.
         
         Args:
             use_s3 (bool): Whether to use S3 for storage (defaults to local file system)
+            dedup (bool): Store bodies content-addressed (defaults to the STORAGE_DEDUP setting)
+            cache (DiskCache): Local disk tier placed in front of S3 reads and writes
+            manifests (ManifestIndex): Per-day manifests used for S3 date-range listing
         """
         self.use_s3 = use_s3
+        self.dedup = dedup
+        self.cache = cache
+        self.manifests = manifests
+        self._bundle_indexes = OrderedDict()
+        self._s3_client = None
         
     def _ensure_directory_exists(self, directory):
         """Ensure that the specified directory exists."""
         Path(directory).mkdir(parents=True, exist_ok=True)
     
     def _get_s3_client(self):
-        """Get an S3 client using the configured credentials."""
+        """Get an S3 client using the configured credentials, built once and shared by all threads."""
         # In production, this would use boto3's default credential chain,
         # relying on environment variables, IAM roles, or AWS config files
-        return boto3.client('s3')
+        if self._s3_client is None:
+            self._s3_client = boto3.client('s3')
+        return self._s3_client
+    
+    def ping(self):
+        """
+        Check that the configured bucket is reachable, warming the S3 client's connection pool.
+        
+        Returns:
+            dict: Details of the check; raises if the bucket cannot be reached
+        """
+        bucket = current_app.config['S3_BUCKET']
+        self._get_s3_client().head_bucket(Bucket=bucket)
+        return {'bucket': bucket}
+    
+    def _storage_dir(self):
+        """Return the root directory for local storage."""
+        return os.path.join(os.getcwd(), 'storage')
+    
+    def _dedup_enabled(self):
+        """Return whether content-addressed storage is enabled."""
+        if self.dedup is not None:
+            return self.dedup
+        return current_app.config.get('STORAGE_DEDUP', False)
     
     def _generate_filepath(self, content_type):
         """Generate a filepath for content storage based on content type and date."""
@@ -35,6 +124,375 @@ class StorageManager:
         filename = f"{uuid.uuid4()}.json"
         return f"{content_type}/{date_path}/{filename}"
     
+    def _put_object(self, key, body, cacheable=True):
+        """Write an object to the active backend under a storage-relative key."""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        
+        if self.use_s3:
+            self._get_s3_client().put_object(
+                Bucket=current_app.config['S3_BUCKET'],
+                Key=key,
+                Body=body,
+                ContentType='application/json'
+            )
+            
+            # Write through to the local tier so the next read skips the round trip
+            if self.cache and cacheable:
+                self.cache.put(key, body, datetime.now().astimezone().isoformat())
+        else:
+            full_path = os.path.join(self._storage_dir(), key)
+            self._ensure_directory_exists(os.path.dirname(full_path))
+            
+            # Write to a temporary file first so readers never see a partial object
+            tmp_path = f"{full_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, full_path)
+    
+    def _get_s3_object(self, key, cacheable=True):
+        """
+        Read an object from the configured bucket, through the local tier if there is one.
+        
+        Bulk scans pass cacheable=False so cold objects they read once do not
+        go through (and evict hot entries from) the local tier.
+        
+        Returns:
+            tuple: (body bytes, ISO last-modified timestamp)
+        """
+        if self.cache and cacheable:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        response = self._get_s3_client().get_object(Bucket=current_app.config['S3_BUCKET'], Key=key)
+        body = response['Body'].read()
+        last_modified = response['LastModified'].isoformat()
+        
+        if self.cache and cacheable:
+            self.cache.put(key, body, last_modified)
+        
+        return body, last_modified
+    
+    def _get_object(self, key, cacheable=True):
+        """Read an object from the active backend; raises if it does not exist."""
+        if self.use_s3:
+            return self._get_s3_object(key, cacheable)[0]
+        
+        with open(os.path.join(self._storage_dir(), key), 'rb') as f:
+            return f.read()
+    
+    def _get_content_object(self, key):
+        """
+        Read a content object, falling back to its day bundle once it has been compacted.
+        
+        Returns:
+            tuple: (body bytes, ISO last-modified timestamp)
+        """
+        try:
+            if self.use_s3:
+                return self._get_s3_object(key)
+            
+            full_path = os.path.join(self._storage_dir(), key)
+            with open(full_path, 'rb') as f:
+                body = f.read()
+            return body, datetime.fromtimestamp(os.path.getmtime(full_path)).isoformat()
+        except Exception:
+            archived = self._read_from_bundle(key)
+            if archived is None:
+                raise
+            return archived
+    
+    def _get_object_range(self, key, start, length=None):
+        """
+        Read a byte range of an object; a negative start reads the last -start bytes.
+        
+        Raises if the object does not exist.
+        """
+        if self.use_s3:
+            byte_range = f"bytes={start}" if start < 0 else f"bytes={start}-{start + length - 1}"
+            response = self._get_s3_client().get_object(
+                Bucket=current_app.config['S3_BUCKET'], Key=key, Range=byte_range
+            )
+            return response['Body'].read()
+        
+        with open(os.path.join(self._storage_dir(), key), 'rb') as f:
+            if start < 0:
+                f.seek(start, os.SEEK_END)
+                return f.read()
+            f.seek(start)
+            return f.read(length)
+    
+    def _object_exists(self, key):
+        """Return whether an object exists in the active backend."""
+        if self.use_s3:
+            try:
+                self._get_s3_client().head_object(Bucket=current_app.config['S3_BUCKET'], Key=key)
+                return True
+            except Exception as e:
+                if getattr(e, 'response', {}).get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                    return False
+                raise
+        
+        return os.path.exists(os.path.join(self._storage_dir(), key))
+    
+    def _delete_object(self, key):
+        """Delete an object from the active backend, ignoring missing objects."""
+        if self.use_s3:
+            self._get_s3_client().delete_object(Bucket=current_app.config['S3_BUCKET'], Key=key)
+            if self.cache:
+                self.cache.invalidate(key)
+            return
+        
+        try:
+            os.remove(os.path.join(self._storage_dir(), key))
+        except FileNotFoundError:
+            pass
+    
+    def _list_keys(self, prefix):
+        """Yield every key under a prefix in the active backend."""
+        if self.use_s3:
+            paginator = self._get_s3_client().get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=current_app.config['S3_BUCKET'], Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    yield obj['Key']
+            return
+        
+        storage_dir = self._storage_dir()
+        base_dir = os.path.join(storage_dir, prefix)
+        for root, _, files in os.walk(base_dir):
+            for file in files:
+                yield os.path.relpath(os.path.join(root, file), storage_dir).replace(os.sep, '/')
+    
+    @contextmanager
+    def _hash_lock(self, content_hash):
+        """
+        Serialize reference updates for one content hash across all workers on the host.
+        
+        This is a local file lock, so it only covers workers on the same host.
+        The deployment runs a single API host, where it makes the marker check
+        and the body delete atomic with respect to saves; running several API
+        hosts against one bucket with STORAGE_DEDUP enabled is not supported,
+        as a delete on one host could remove a body another host just reused.
+        """
+        lock_dir = os.path.join(self._storage_dir(), '_locks')
+        self._ensure_directory_exists(lock_dir)
+        with open(os.path.join(lock_dir, f"{content_hash[:2]}.lock"), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _body_key(self, content_hash):
+        """Return the key of a content-addressed body."""
+        return f"{self.OBJECTS_PREFIX}/{content_hash[:2]}/{content_hash}.json"
+    
+    def _ref_marker_key(self, content_hash, filepath):
+        """Return the key of the marker recording that a reference points at a body."""
+        ref_id = os.path.splitext(os.path.basename(filepath))[0]
+        return f"{self.REFS_PREFIX}/{content_hash}/{ref_id}"
+    
+    def _save_deduplicated(self, content_data, filepath):
+        """
+        Store a body once under the hash of its canonical encoding and reference it.
+        
+        Only the content is hashed; the per-save generation `metadata`
+        (timestamp, prompt, tokens) stays in the reference document, so
+        regenerating identical content reuses the stored body.
+        
+        Returns:
+            tuple: (reference document, whether the body already existed)
+        """
+        body = {key: value for key, value in content_data.items() if key != 'metadata'}
+        canonical = json.dumps(body, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        content_hash = hashlib.sha256(canonical).hexdigest()
+        body_key = self._body_key(content_hash)
+        
+        with self._hash_lock(content_hash):
+            # Record the reference before checking the body so a concurrent delete keeps it
+            self._put_object(self._ref_marker_key(content_hash, filepath), b'', cacheable=False)
+            
+            existed = self._object_exists(body_key)
+            if not existed:
+                self._put_object(body_key, canonical)
+        
+        reference = {
+            **{key: value for key, value in content_data.items() if key == 'metadata'},
+            'storage_metadata': {
+                'filepath': filepath,
+                'timestamp': datetime.now().isoformat(),
+                'version': '1.0',
+                'content_hash': content_hash,
+                'content_ref': body_key,
+                'content_size': len(canonical)
+            }
+        }
+        self._put_object(filepath, json.dumps(reference, indent=2), cacheable=False)
+        
+        return reference, existed
+    
+    def _resolve_reference(self, content):
+        """Merge a content-addressed reference document with the body it points at."""
+        storage_metadata = content.get('storage_metadata', {}) if isinstance(content, dict) else {}
+        body_key = storage_metadata.get('content_ref')
+        if not body_key:
+            return content
+        
+        body = json.loads(self._get_object(body_key))
+        return {**body, **content}
+    
+    def _read_bundle_index(self, bundle_key):
+        """
+        Return the index of a bundle, or None if the bundle does not exist.
+        
+        Bundles are immutable once written, so indexes are cached in memory
+        and each lookup after the first costs a single ranged read.
+        """
+        cache_key = (self.use_s3, bundle_key)
+        if cache_key in self._bundle_indexes:
+            self._bundle_indexes.move_to_end(cache_key)
+            return self._bundle_indexes[cache_key]
+        
+        if not self._object_exists(bundle_key):
+            return None
+        
+        index_offset, index_length = parse_footer(self._get_object_range(bundle_key, -BUNDLE_FOOTER.size))
+        index = parse_index(self._get_object_range(bundle_key, index_offset, index_length))
+        
+        self._bundle_indexes[cache_key] = index
+        if len(self._bundle_indexes) > self.BUNDLE_INDEX_CACHE_SIZE:
+            self._bundle_indexes.popitem(last=False)
+        return index
+    
+    def _read_from_bundle(self, key):
+        """
+        Read an archived object through its day bundle.
+        
+        Returns:
+            tuple: (body bytes, ISO last-modified timestamp), or None if the key is not archived
+        """
+        bundle_key = bundle_key_for(key)
+        index = self._read_bundle_index(bundle_key) if bundle_key else None
+        entry = index.get(key) if index else None
+        if entry is None:
+            return None
+        
+        body = decode_member(self._get_object_range(bundle_key, entry['offset'], entry['length']))
+        return body, entry['last_modified']
+    
+    def _iter_partitions(self, content_type=None, include_archived=False):
+        """
+        Yield day partitions holding loose objects (and, optionally, archived ones).
+        
+        Yields:
+            tuple: (bundle key, day as YYYY-MM-DD, list of (key, ISO last-modified))
+        """
+        partitions = {}
+        
+        if self.use_s3:
+            paginator = self._get_s3_client().get_paginator('list_objects_v2')
+            prefix = f"{content_type}/" if content_type else ""
+            for page in paginator.paginate(Bucket=current_app.config['S3_BUCKET'], Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    if obj['Key'].startswith('_'):
+                        continue
+                    if include_archived and obj['Key'].endswith(BUNDLE_SUFFIX):
+                        partitions.setdefault(obj['Key'], [])
+                        continue
+                    bundle_key = bundle_key_for(obj['Key'])
+                    if bundle_key:
+                        partitions.setdefault(bundle_key, []).append((obj['Key'], obj['LastModified'].isoformat()))
+        else:
+            storage_dir = self._storage_dir()
+            for root, _, files in os.walk(os.path.join(storage_dir, content_type) if content_type else storage_dir):
+                rel_dir = os.path.relpath(root, storage_dir).replace(os.sep, '/')
+                if rel_dir.startswith('_'):
+                    continue
+                for name in sorted(files):
+                    key = f"{rel_dir}/{name}"
+                    if include_archived and name.endswith(BUNDLE_SUFFIX) and len(key.split('/')) == 4:
+                        partitions.setdefault(key, [])
+                        continue
+                    bundle_key = bundle_key_for(key)
+                    if bundle_key:
+                        last_modified = datetime.fromtimestamp(os.path.getmtime(os.path.join(root, name))).isoformat()
+                        partitions.setdefault(bundle_key, []).append((key, last_modified))
+        
+        for bundle_key, objects in sorted(partitions.items()):
+            yield bundle_key, '-'.join(bundle_key[:-len(BUNDLE_SUFFIX)].split('/')[1:]), objects
+    
+    def compact_partitions(self, older_than_days=30, content_type=None):
+        """
+        Roll day partitions older than a cutoff into compressed bundles.
+        
+        Each partition becomes one 'content_type/YYYY/MM/DD.bundle' object with
+        an embedded offset index, after which the loose objects are deleted.
+        Bundles are never rewritten: if a bundle already exists, loose objects
+        it already contains are deleted (finishing an interrupted run) and any
+        others are left in place, where listing and retrieval still find them.
+        
+        Args:
+            older_than_days (int): Only compact partitions at least this many days old
+            content_type (str): Only compact this content type
+            
+        Returns:
+            dict: Counts of bundles written and objects archived
+        """
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime('%Y-%m-%d')
+        summary = {'status': 'success', 'bundles': 0, 'objects': 0, 'bytes_before': 0, 'bytes_after': 0}
+        
+        for bundle_key, day, objects in self._iter_partitions(content_type):
+            if day >= cutoff:
+                continue
+            
+            index = self._read_bundle_index(bundle_key)
+            if index is not None:
+                for key, _ in objects:
+                    if key in index:
+                        self._delete_object(key)
+                continue
+            
+            # Sources are read once and deleted, so they bypass the local tier
+            members = [(key, self._get_object(key, cacheable=False), last_modified) for key, last_modified in objects]
+            bundle = build_bundle(members)
+            self._put_object(bundle_key, bundle, cacheable=False)
+            
+            # Only drop the loose objects once the bundle can be read back
+            index = self._read_bundle_index(bundle_key)
+            for key, _, _ in members:
+                if key in index:
+                    self._delete_object(key)
+            
+            if not self.use_s3:
+                try:
+                    os.rmdir(os.path.join(self._storage_dir(), bundle_key[:-len(BUNDLE_SUFFIX)]))
+                except OSError:
+                    pass
+            
+            summary['bundles'] += 1
+            summary['objects'] += len(members)
+            summary['bytes_before'] += sum(len(body) for _, body, _ in members)
+            summary['bytes_after'] += len(bundle)
+        
+        return summary
+    
+    def _manifests_enabled(self):
+        """Return whether per-day manifests are maintained for the active backend."""
+        return bool(self.use_s3 and self.manifests and self.manifests.enabled)
+    
+    def _record_manifest(self, filepath, content_data, size, timestamp):
+        """Buffer a manifest entry for a saved object."""
+        if self._manifests_enabled():
+            parts = filepath.split('/')
+            self.manifests.append(parts[0], parts[1:4], self.manifests.make_entry(filepath, size, content_data, timestamp))
+    
+    def _record_manifest_delete(self, filepath):
+        """Buffer a manifest tombstone for a deleted object."""
+        if self._manifests_enabled():
+            parts = filepath.split('/')
+            self.manifests.append(parts[0], parts[1:4], self.manifests.make_tombstone(filepath))
+    
     def save_content(self, content_data, content_type):
         """
         Save content to storage.
@@ -47,6 +505,36 @@ class StorageManager:
             dict: Information about the saved content
         """
         filepath = self._generate_filepath(content_type)
+        
+        if self._dedup_enabled():
+            try:
+                reference, existed = self._save_deduplicated(content_data, filepath)
+                self._record_manifest(
+                    filepath, content_data, reference['storage_metadata']['content_size'],
+                    reference['storage_metadata']['timestamp']
+                )
+                
+                if self.use_s3:
+                    location = f"s3://{current_app.config['S3_BUCKET']}/{filepath}"
+                else:
+                    location = os.path.join(self._storage_dir(), filepath)
+                
+                return {
+                    'status': 'success',
+                    'storage_type': 's3' if self.use_s3 else 'local',
+                    'location': location,
+                    'deduplicated': existed,
+                    'metadata': reference['storage_metadata']
+                }
+                
+            except Exception as e:
+                storage_label = 'S3' if self.use_s3 else 'Local'
+                current_app.logger.error(f"{storage_label} Storage Error: {str(e)}")
+                return {
+                    'status': 'error',
+                    'error': str(e)
+                }
+        
         content_with_metadata = {
             **content_data,
             'storage_metadata': {
@@ -62,14 +550,11 @@ class StorageManager:
         if self.use_s3:
             # S3 storage implementation
             try:
-                s3 = self._get_s3_client()
                 s3_bucket = current_app.config['S3_BUCKET']
-                
-                s3.put_object(
-                    Bucket=s3_bucket,
-                    Key=filepath,
-                    Body=content_json,
-                    ContentType='application/json'
+                self._put_object(filepath, content_json)
+                self._record_manifest(
+                    filepath, content_data, len(content_json.encode('utf-8')),
+                    content_with_metadata['storage_metadata']['timestamp']
                 )
                 
                 return {
@@ -88,21 +573,12 @@ class StorageManager:
         else:
             # Local file system storage implementation
             try:
-                # Default to 'storage' directory in the current working directory
-                storage_dir = os.path.join(os.getcwd(), 'storage')
-                full_path = os.path.join(storage_dir, filepath)
-                
-                # Ensure directory exists
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                
-                # Write the content to file
-                with open(full_path, 'w') as f:
-                    f.write(content_json)
+                self._put_object(filepath, content_json)
                 
                 return {
                     'status': 'success',
                     'storage_type': 'local',
-                    'location': full_path,
+                    'location': os.path.join(self._storage_dir(), filepath),
                     'metadata': content_with_metadata['storage_metadata']
                 }
                 
@@ -113,6 +589,19 @@ class StorageManager:
                     'error': str(e)
                 }
     
+    def save_many(self, contents, content_type):
+        """
+        Save several content items of the same type.
+        
+        Args:
+            contents (list): Content data dicts to save
+            content_type (str): Type of content (blog, social, etc.)
+            
+        Returns:
+            list: save_content results, in input order
+        """
+        return [self.save_content(content_data, content_type) for content_data in contents]
+    
     def retrieve_content(self, filepath, is_s3_path=None):
         """
         Retrieve content from storage.
@@ -131,8 +620,6 @@ class StorageManager:
         if is_s3_path or self.use_s3:
             # S3 retrieval implementation
             try:
-                s3 = self._get_s3_client()
-                
                 # Extract bucket and key from S3 path
                 if filepath.startswith('s3://'):
                     parts = filepath.replace('s3://', '').split('/', 1)
@@ -142,15 +629,19 @@ class StorageManager:
                     bucket = current_app.config['S3_BUCKET']
                     key = filepath
                 
-                response = s3.get_object(Bucket=bucket, Key=key)
-                content = response['Body'].read().decode('utf-8')
+                if bucket == current_app.config['S3_BUCKET']:
+                    # Objects in our own bucket go through the local tier and day bundles
+                    body, last_modified = self._get_content_object(key)
+                else:
+                    response = self._get_s3_client().get_object(Bucket=bucket, Key=key)
+                    body, last_modified = response['Body'].read(), response['LastModified'].isoformat()
                 
                 return {
                     'status': 'success',
-                    'content': json.loads(content),
+                    'content': self._resolve_reference(json.loads(body.decode('utf-8'))),
                     'metadata': {
-                        'last_modified': response['LastModified'].isoformat(),
-                        'size': response['ContentLength']
+                        'last_modified': last_modified,
+                        'size': len(body)
                     }
                 }
                 
@@ -165,21 +656,19 @@ class StorageManager:
             try:
                 # If it's an absolute path, use it directly
                 if os.path.isabs(filepath):
-                    full_path = filepath
+                    with open(filepath, 'rb') as f:
+                        body = f.read()
+                    last_modified = datetime.fromtimestamp(os.path.getmtime(filepath)).isoformat()
                 else:
-                    # Otherwise, treat it as relative to the storage directory
-                    storage_dir = os.path.join(os.getcwd(), 'storage')
-                    full_path = os.path.join(storage_dir, filepath)
-                
-                with open(full_path, 'r') as f:
-                    content = json.load(f)
+                    # Otherwise, treat it as relative to the storage directory (or its day bundle)
+                    body, last_modified = self._get_content_object(filepath)
                 
                 return {
                     'status': 'success',
-                    'content': content,
+                    'content': self._resolve_reference(json.loads(body.decode('utf-8'))),
                     'metadata': {
-                        'last_modified': datetime.fromtimestamp(os.path.getmtime(full_path)).isoformat(),
-                        'size': os.path.getsize(full_path)
+                        'last_modified': last_modified,
+                        'size': len(body)
                     }
                 }
                 
@@ -190,119 +679,523 @@ class StorageManager:
                     'error': str(e)
                 }
     
-    def list_content(self, content_type=None, start_date=None, end_date=None, limit=100):
+    def delete_content(self, filepath):
         """
-        List available content, optionally filtered by type and date range.
+        Delete stored content.
+        
+        For content-addressed saves this removes the reference and its marker,
+        and deletes the shared body only once no other reference points at it.
         
         Args:
-            content_type (str): Type of content to filter by
-            start_date (str): ISO date string for start date filter
-            end_date (str): ISO date string for end date filter
-            limit (int): Maximum number of items to return
+            filepath (str): Storage-relative key of the content
             
         Returns:
-            dict: List of content items or error information
+            dict: Deletion result or error information
         """
-        if self.use_s3:
-            # S3 listing implementation
-            try:
-                s3 = self._get_s3_client()
-                bucket = current_app.config['S3_BUCKET']
-                
-                # Build prefix based on content type
-                prefix = f"{content_type}/" if content_type else ""
-                
-                response = s3.list_objects_v2(
-                    Bucket=bucket,
-                    Prefix=prefix,
-                    MaxKeys=limit
-                )
-                
-                items = []
-                for obj in response.get('Contents', []):
-                    # Filtering by date would require retrieving each object's metadata
-                    # For efficiency, this is simplified for now
-                    items.append({
-                        'key': obj['Key'],
-                        'location': f"s3://{bucket}/{obj['Key']}",
-                        'last_modified': obj['LastModified'].isoformat(),
-                        'size': obj['Size']
-                    })
-                
-                return {
-                    'status': 'success',
-                    'items': items,
-                    'count': len(items)
-                }
-                
-            except Exception as e:
-                current_app.logger.error(f"S3 Listing Error: {str(e)}")
-                return {
-                    'status': 'error',
-                    'error': str(e)
-                }
-        else:
-            # Local file system listing implementation
-            try:
-                storage_dir = os.path.join(os.getcwd(), 'storage')
-                
-                # Build directory path based on content type
-                if content_type:
-                    dir_path = os.path.join(storage_dir, content_type)
-                else:
-                    dir_path = storage_dir
-                
-                # Check if directory exists
-                if not os.path.exists(dir_path):
+        try:
+            parts = filepath.split('/')
+            if os.path.isabs(filepath) or '..' in parts or parts[0].startswith('_'):
+                raise ValueError(f"Invalid content key: {filepath}")
+            
+            if not self._object_exists(filepath):
+                if self._read_from_bundle(filepath) is not None:
+                    # Bundles are immutable; the route answers this with a 409
                     return {
-                        'status': 'success',
-                        'items': [],
-                        'count': 0
+                        'status': 'error',
+                        'error': f"Content has been archived and cannot be deleted: {filepath}",
+                        'archived': True
                     }
+                raise FileNotFoundError(f"Content not found: {filepath}")
+            
+            content = json.loads(self._get_object(filepath))
+            storage_metadata = content.get('storage_metadata', {}) if isinstance(content, dict) else {}
+            content_hash = storage_metadata.get('content_hash')
+            body_deleted = False
+            
+            self._delete_object(filepath)
+            self._record_manifest_delete(filepath)
+            
+            if content_hash:
+                with self._hash_lock(content_hash):
+                    self._delete_object(self._ref_marker_key(content_hash, filepath))
+                    if next(self._list_keys(f"{self.REFS_PREFIX}/{content_hash}/"), None) is None:
+                        self._delete_object(self._body_key(content_hash))
+                        body_deleted = True
+            
+            return {
+                'status': 'success',
+                'deleted': filepath,
+                'body_deleted': body_deleted
+            }
+            
+        except Exception as e:
+            storage_label = 'S3' if self.use_s3 else 'Local'
+            current_app.logger.error(f"{storage_label} Deletion Error: {str(e)}")
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
+    
+    def _iter_local_keys(self, type_dir, content_type, position=None, start_day=None, end_day=None):
+        """
+        Yield stored keys for one content type, newest day first.
+        
+        Walks the content_type/YYYY/MM/DD layout in descending order and prunes
+        whole directories that sort at or after the cursor position or fall
+        outside the requested day range, so resuming a listing only touches the
+        directories on the path to the cursor. Compacted days are read from the
+        index of their DD.bundle file and merged with any loose objects.
+        
+        Yields:
+            tuple: (sort_key, key, full_path, archived_entry) where sort_key is
+            (YYYY, MM, DD, key) and archived_entry is the bundle index entry for
+            compacted objects (None for loose files)
+        """
+        storage_dir = self._storage_dir()
+        
+        def walk_days(month_dir, parts):
+            days = {}
+            for name in os.listdir(month_dir):
+                full_path = os.path.join(month_dir, name)
+                if name.endswith(BUNDLE_SUFFIX):
+                    days.setdefault(name[:-len(BUNDLE_SUFFIX)], {})['bundle'] = full_path
+                elif os.path.isdir(full_path):
+                    days.setdefault(name, {})['dir'] = full_path
+            
+            for day in sorted(days, reverse=True):
+                sub_parts = parts + [day]
+                if position and sub_parts > position[:3]:
+                    continue
+                day_string = '-'.join(sub_parts)
+                if start_day and day_string < start_day:
+                    continue
+                if end_day and day_string > end_day:
+                    continue
                 
-                items = []
-                count = 0
+                entries = {}
+                if 'bundle' in days[day]:
+                    bundle_key = os.path.relpath(days[day]['bundle'], storage_dir).replace(os.sep, '/')
+                    for key, entry in (self._read_bundle_index(bundle_key) or {}).items():
+                        entries[key] = (os.path.join(storage_dir, key), entry)
+                if 'dir' in days[day]:
+                    for name in os.listdir(days[day]['dir']):
+                        if name.endswith('.json'):
+                            key = f"{content_type}/{'/'.join(sub_parts)}/{name}"
+                            entries[key] = (os.path.join(days[day]['dir'], name), None)
                 
-                # Walk the directory tree
-                for root, _, files in os.walk(dir_path):
-                    for file in files:
-                        if file.endswith('.json'):
-                            file_path = os.path.join(root, file)
-                            rel_path = os.path.relpath(file_path, storage_dir)
-                            
-                            # Get file metadata
-                            mtime = os.path.getmtime(file_path)
-                            file_date = datetime.fromtimestamp(mtime)
-                            
-                            # Apply date filters if specified
-                            if start_date and file_date.isoformat() < start_date:
-                                continue
-                            if end_date and file_date.isoformat() > end_date:
-                                continue
-                            
-                            items.append({
-                                'key': rel_path,
-                                'location': file_path,
-                                'last_modified': file_date.isoformat(),
-                                'size': os.path.getsize(file_path)
-                            })
-                            
-                            count += 1
-                            if count >= limit:
-                                break
+                for key in sorted(entries, reverse=True):
+                    sort_key = sub_parts + [key]
+                    if position and sort_key >= position:
+                        continue
+                    yield (sort_key, key) + entries[key]
+        
+        def walk(dir_path, parts):
+            level = len(parts)
+            if level == 2:
+                yield from walk_days(dir_path, parts)
+                return
+            
+            try:
+                names = sorted(os.listdir(dir_path), reverse=True)
+            except FileNotFoundError:
+                return
+            
+            for name in names:
+                full_path = os.path.join(dir_path, name)
+                sub_parts = parts + [name]
+                if not os.path.isdir(full_path):
+                    continue
+                # Everything under a directory newer than the cursor was already served
+                if position and sub_parts > position[:level + 1]:
+                    continue
+                yield from walk(full_path, sub_parts)
+        
+        yield from walk(type_dir, [])
+    
+    def iter_content(self, content_type=None, start_date=None, end_date=None, limit=100, cursor=None):
+        """
+        Lazily list one page of content, optionally filtered by type and date range.
+        
+        Errors while listing are raised to the caller rather than wrapped in a
+        status dict so that streaming responses can decide how to surface them.
+        An invalid cursor raises ValueError immediately.
+        
+        Args:
+            content_type (str): Type of content to filter by
+            start_date (str): ISO date string for start date filter
+            end_date (str): ISO date string for end date filter
+            limit (int): Maximum number of items in the page
+            cursor (str): Opaque cursor returned by a previous page
+            
+        Returns:
+            ContentPage: Iterable of content items; `next_cursor` is set once exhausted
+        """
+        state = _decode_cursor(cursor)
+        page = ContentPage()
+        
+        if self.use_s3 and start_date and self._manifests_enabled():
+            # Date-range queries are answered from the per-day manifests
+            if state and not isinstance(state.get('mpos'), list):
+                raise ValueError("Cursor does not belong to a manifest listing")
+            page.items = self._iter_manifest_page(
+                page, content_type, start_date, end_date, limit, state and state['mpos']
+            )
+        elif self.use_s3:
+            if state and not isinstance(state.get('s3after'), str):
+                raise ValueError("Cursor does not belong to S3 storage")
+            page.items = self._iter_s3_page(
+                page, content_type, start_date, end_date, limit,
+                state and state['s3after'], (state or {}).get('skip', 0)
+            )
+        else:
+            if state and not isinstance(state.get('pos'), list):
+                raise ValueError("Cursor does not belong to local storage")
+            page.items = self._iter_local_page(
+                page, content_type, start_date, end_date, limit, state and state['pos']
+            )
+        
+        return page
+    
+    def _iter_s3_objects(self, prefix, start_after=None, page_size=1000):
+        """
+        Yield listed S3 objects under a prefix in key order, starting after a key.
+        
+        Internal keys are never yielded: the first one met restarts the listing
+        past the whole '_' range, so unfiltered listings do not page through
+        every content-addressed body, reference marker and manifest segment.
+        """
+        params = {
+            'Bucket': current_app.config['S3_BUCKET'],
+            'Prefix': prefix,
+            'MaxKeys': page_size
+        }
+        if start_after:
+            params['StartAfter'] = start_after
+        
+        while True:
+            response = self._get_s3_client().list_objects_v2(**params)
+            
+            jump = False
+            for obj in response.get('Contents', []):
+                if obj['Key'].startswith('_'):
+                    jump = True
+                    break
+                yield obj
+            
+            if jump and params.get('StartAfter', '') < INTERNAL_KEYS_END:
+                params.pop('ContinuationToken', None)
+                params['StartAfter'] = INTERNAL_KEYS_END
+                continue
+            
+            if not response.get('IsTruncated'):
+                return
+            params['ContinuationToken'] = response['NextContinuationToken']
+    
+    @staticmethod
+    def _key_day(key):
+        """Return the YYYY-MM-DD day of a content or bundle key, or None for other keys."""
+        parts = key.split('/')
+        if len(parts) == 4 and parts[3].endswith(BUNDLE_SUFFIX):
+            return '-'.join(parts[1:3] + [parts[3][:-len(BUNDLE_SUFFIX)]])
+        if bundle_key_for(key):
+            return '-'.join(parts[1:4])
+        return None
+    
+    @staticmethod
+    def _local_timestamp(value):
+        """Return an ISO timestamp as naive local time, the form saves record and date filters use."""
+        timestamp = datetime.fromisoformat(value)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        return timestamp.isoformat()
+    
+    def _s3_content_types(self):
+        """Return the content types stored in the bucket, skipping internal prefixes."""
+        paginator = self._get_s3_client().get_paginator('list_objects_v2')
+        types = set()
+        for result in paginator.paginate(Bucket=current_app.config['S3_BUCKET'], Delimiter='/'):
+            for common in result.get('CommonPrefixes', []):
+                if not common['Prefix'].startswith('_'):
+                    types.add(common['Prefix'].rstrip('/'))
+        return sorted(types)
+    
+    def _iter_s3_day_range(self, content_type, start_day, end_day, start_after=None, page_size=1000):
+        """
+        Yield listed S3 objects whose key falls within a day range, in key order.
+        
+        Keys carry their day (content_type/YYYY/MM/DD/...), so each content type
+        is listed from its first day in range and stops at the first key past
+        the last one, without reading any object metadata.
+        """
+        content_types = [content_type] if content_type else self._s3_content_types()
+        
+        # Order by prefix so keys come out in global key order ('a-b/' sorts before 'a/')
+        for prefix in sorted(f"{name}/" for name in content_types):
+            # Types that sort entirely before the cursor were already served
+            if start_after and start_after > prefix and not start_after.startswith(prefix):
+                continue
+            
+            begin = f"{prefix}{start_day.replace('-', '/')}" if start_day else None
+            if start_after and (begin is None or start_after > begin):
+                begin = start_after
+            
+            for obj in self._iter_s3_objects(prefix, begin, page_size):
+                day = self._key_day(obj['Key'])
+                if day is None or (start_day and day < start_day):
+                    continue
+                if end_day and day > end_day:
+                    break
+                yield obj
+    
+    def _iter_s3_page(self, page, content_type, start_date, end_date, limit, start_after=None, skip=0):
+        """
+        Yield one page of S3 items in key order, resuming after the last key served.
+        
+        Compacted day bundles expand into the objects they archive, one item
+        each, so a page can end inside a bundle; its cursor then records the
+        bundle key and how many of its members were already served. Date
+        filters narrow the listing to the days in range by key, then compare
+        each item's timestamp like the local backend does.
+        """
+        bucket = current_app.config['S3_BUCKET']
+        
+        if start_date or end_date:
+            sources = self._iter_s3_day_range(
+                content_type, start_date and start_date[:10], end_date and end_date[:10], start_after, limit + 1
+            )
+        else:
+            # Build prefix based on content type
+            prefix = f"{content_type}/" if content_type else ""
+            sources = self._iter_s3_objects(prefix, start_after, limit + 1)
+        
+        def in_range(last_modified):
+            if not (start_date or end_date):
+                return True
+            timestamp = self._local_timestamp(last_modified)
+            return not ((start_date and timestamp < start_date) or (end_date and timestamp > end_date))
+        
+        if skip:
+            # The previous page ended inside this bundle; serve the rest of it first
+            sources = itertools.chain([{'Key': start_after}], sources)
+        
+        count = 0
+        position = None
+        
+        for obj in sources:
+            # Expand compacted day bundles into the objects they archive
+            if obj['Key'].endswith(BUNDLE_SUFFIX):
+                members = sorted((self._read_bundle_index(obj['Key']) or {}).items())
+                first, skip = skip, 0
+                for number, (key, entry) in enumerate(members[first:], first):
+                    if not in_range(entry['last_modified']):
+                        continue
                     
+                    # A further item exists, so hand out a cursor to the last one served
                     if count >= limit:
-                        break
-                
-                return {
-                    'status': 'success',
-                    'items': items,
-                    'count': len(items)
-                }
-                
-            except Exception as e:
-                current_app.logger.error(f"Local Listing Error: {str(e)}")
-                return {
-                    'status': 'error',
-                    'error': str(e)
-                }
+                        page.next_cursor = _encode_cursor(position)
+                        return
+                    
+                    position = page.position = {'s3after': obj['Key'], 'skip': number + 1}
+                    yield {
+                        'key': key,
+                        'location': f"s3://{bucket}/{key}",
+                        'last_modified': entry['last_modified'],
+                        'size': entry['size']
+                    }
+                    
+                    count += 1
+                position = {'s3after': obj['Key']}
+                continue
+            
+            if not in_range(obj['LastModified'].isoformat()):
+                continue
+            
+            if count >= limit:
+                page.next_cursor = _encode_cursor(position)
+                return
+            
+            position = page.position = {'s3after': obj['Key']}
+            yield {
+                'key': obj['Key'],
+                'location': f"s3://{bucket}/{obj['Key']}",
+                'last_modified': obj['LastModified'].isoformat(),
+                'size': obj['Size']
+            }
+            
+            count += 1
+    
+    def _iter_manifest_days(self, content_type, start_day, end_day, position=None):
+        """
+        Yield manifest entries for one content type, newest day first.
+        
+        Only days that have manifest segments are read, found with delimiter
+        listings rather than one LIST per calendar day. Days recent enough
+        that other workers may still be buffering entries are also listed
+        live from the bucket, merged with the manifest.
+        
+        Yields:
+            tuple: (sort_key, entry) where sort_key is (YYYY, MM, DD, key)
+        """
+        bucket = current_app.config['S3_BUCKET']
+        first_day = start_day.strftime('%Y/%m/%d').split('/')
+        last_day = end_day.strftime('%Y/%m/%d').split('/')
+        if position and position[:3] < last_day:
+            last_day = position[:3]
+        
+        recent_days = []
+        day = end_day
+        while day >= start_day:
+            day_parts = day.strftime('%Y/%m/%d').split('/')
+            if not self.manifests.is_recent(day_parts):
+                break
+            if day_parts <= last_day:
+                recent_days.append(day_parts)
+            day -= timedelta(days=1)
+        
+        previous = None
+        for day_parts in heapq.merge(
+            recent_days, self.manifests.days(content_type, first_day, last_day), reverse=True
+        ):
+            if day_parts == previous:
+                continue
+            previous = day_parts
+            
+            entries = {entry['key']: entry for entry in self.manifests.read_day(content_type, day_parts)}
+            
+            if self.manifests.is_recent(day_parts):
+                paginator = self._get_s3_client().get_paginator('list_objects_v2')
+                for result in paginator.paginate(Bucket=bucket, Prefix=f"{content_type}/{'/'.join(day_parts)}/"):
+                    for obj in result.get('Contents', []):
+                        if obj['Key'] not in entries and bundle_key_for(obj['Key']):
+                            entries[obj['Key']] = {
+                                'key': obj['Key'],
+                                'size': obj['Size'],
+                                'timestamp': obj['LastModified'].astimezone().replace(tzinfo=None).isoformat(),
+                                'preview': None
+                            }
+            
+            for key in sorted(entries, reverse=True):
+                sort_key = day_parts + [key]
+                if position and sort_key >= position:
+                    continue
+                yield sort_key, entries[key]
+    
+    def _iter_manifest_page(self, page, content_type, start_date, end_date, limit, position=None):
+        """Yield one page of S3 items from the per-day manifests, newest first."""
+        bucket = current_app.config['S3_BUCKET']
+        start_day = datetime.fromisoformat(start_date[:10])
+        end_day = datetime.fromisoformat(end_date[:10]) if end_date else datetime.now()
+        content_types = [content_type] if content_type else self.manifests.content_types()
+        
+        walkers = [self._iter_manifest_days(name, start_day, end_day, position) for name in content_types]
+        
+        count = 0
+        
+        for sort_key, entry in heapq.merge(*walkers, key=lambda item: item[0], reverse=True):
+            if entry['timestamp'] < start_date:
+                continue
+            if end_date and entry['timestamp'] > end_date:
+                continue
+            
+            # A further matching item exists, so hand out a cursor to the last one served
+            if count >= limit:
+                page.next_cursor = _encode_cursor(page.position)
+                return
+            
+            page.position = {'mpos': sort_key}
+            yield {
+                'key': entry['key'],
+                'location': f"s3://{bucket}/{entry['key']}",
+                'last_modified': entry['timestamp'],
+                'size': entry['size'],
+                'preview': entry['preview']
+            }
+            
+            count += 1
+    
+    def _iter_local_page(self, page, content_type, start_date, end_date, limit, position=None):
+        """Yield one page of local items, newest first, resuming after a (date, key) position."""
+        storage_dir = self._storage_dir()
+        
+        if content_type:
+            content_types = [content_type]
+        elif os.path.isdir(storage_dir):
+            content_types = sorted(
+                name for name in os.listdir(storage_dir)
+                if not name.startswith('_') and os.path.isdir(os.path.join(storage_dir, name))
+            )
+        else:
+            content_types = []
+        
+        # Merge the per-type walks so pages are ordered by (date, key) across types
+        walkers = [
+            self._iter_local_keys(
+                os.path.join(storage_dir, name), name, position,
+                start_date[:10] if start_date else None,
+                end_date[:10] if end_date else None
+            )
+            for name in content_types
+        ]
+        
+        count = 0
+        
+        for sort_key, key, file_path, archived in heapq.merge(*walkers, key=lambda entry: entry[0], reverse=True):
+            if archived:
+                last_modified, size = archived['last_modified'], archived['size']
+            else:
+                stat = os.stat(file_path)
+                last_modified, size = datetime.fromtimestamp(stat.st_mtime).isoformat(), stat.st_size
+            
+            # Apply date filters if specified
+            if start_date and last_modified < start_date:
+                continue
+            if end_date and last_modified > end_date:
+                continue
+            
+            # A further matching item exists, so hand out a cursor to the last one served
+            if count >= limit:
+                page.next_cursor = _encode_cursor(page.position)
+                return
+            
+            page.position = {'pos': sort_key}
+            yield {
+                'key': key,
+                'location': file_path,
+                'last_modified': last_modified,
+                'size': size
+            }
+            
+            count += 1
+    
+    def list_content(self, content_type=None, start_date=None, end_date=None, limit=100, cursor=None):
+        """
+        List available content, optionally filtered by type and date range.
+        
+        Args:
+            content_type (str): Type of content to filter by
+            start_date (str): ISO date string for start date filter
+            end_date (str): ISO date string for end date filter
+            limit (int): Maximum number of items to return
+            cursor (str): Opaque cursor returned by a previous page
+            
+        Returns:
+            dict: List of content items or error information
+        """
+        try:
+            page = self.iter_content(content_type, start_date, end_date, limit, cursor)
+            items = list(page)
+            
+            return {
+                'status': 'success',
+                'items': items,
+                'count': len(items),
+                'next_cursor': page.next_cursor
+            }
+            
+        except Exception as e:
+            storage_label = 'S3' if self.use_s3 else 'Local'
+            current_app.logger.error(f"{storage_label} Listing Error: {str(e)}")
+            return {
+                'status': 'error',
+                'error': str(e)
+            }
@@ -0,0 +1,204 @@
+import math
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; fall back to a character-based estimate
+    tiktoken = None
+
+# Context window per model family; the longest matching prefix wins
+DEFAULT_CONTEXT_WINDOWS = {
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-3.5-turbo': 16385,
+}
+
+# Window assumed for models missing from the table
+FALLBACK_CONTEXT_WINDOW = 8192
+
+# Chat format overhead: tokens per message and for priming the reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Characters per token for the estimate used without tiktoken (errs on the high side)
+CHARS_PER_TOKEN = 3.5
+
+VAR_POLICIES = ('summarize', 'truncate', 'reject')
+
+
+class BudgetError(Exception):
+    """Raised when a request cannot fit the model's context window."""
+
+
+@lru_cache(maxsize=32)
+def _encoding(model):
+    """Return the cached tiktoken encoding for a model, or None to use the estimate."""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        # Encodings are downloaded on first use; without them, estimate instead
+        return None
+
+
+def count_tokens(text, model):
+    """Count the tokens of a text for a model, exactly with tiktoken or as an estimate."""
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages, model):
+    """Count the prompt tokens of a list of chat messages, including the chat format overhead."""
+    return sum(TOKENS_PER_MESSAGE + count_tokens(message['content'], model) for message in messages) + TOKENS_PER_REPLY
+
+
+def _truncate_to_tokens(text, max_tokens, model):
+    """Cut a text down to at most max_tokens tokens."""
+    encoding = _encoding(model)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+    return text[:int(max_tokens * CHARS_PER_TOKEN)]
+
+
+class TokenBudget:
+    """
+    Token budgeting applied before every upstream call.
+
+    Template variables longer than `var_max_tokens` are shortened by policy:
+    'summarize' keeps the leading items of a list value and notes how many
+    were left out, and truncates strings, which are never split at their
+    commas; 'truncate' cuts the value; 'reject' refuses the
+    request. The prompt is then counted locally and `max_tokens` lowered to
+    what is left of the model's context window. A request whose prompt leaves
+    less than `min_completion_tokens` is rejected without calling the API.
+    """
+
+    def __init__(self, context_windows=None, var_max_tokens=750, var_policy='summarize',
+                 min_completion_tokens=64, model='gpt-4'):
+        """
+        Initialize the budget.
+
+        Args:
+            context_windows (dict): Overrides for DEFAULT_CONTEXT_WINDOWS
+            var_max_tokens (int): Maximum tokens per template variable
+            var_policy (str): 'summarize', 'truncate' or 'reject'
+            min_completion_tokens (int): Smallest completion budget worth a call
+            model (str): Model whose tokenizer measures template variables
+        """
+        self.context_windows = {**DEFAULT_CONTEXT_WINDOWS, **(context_windows or {})}
+        self.var_max_tokens = var_max_tokens
+        self.var_policy = var_policy
+        self.min_completion_tokens = min_completion_tokens
+        self.model = model
+        self.enabled = True
+
+    def init_app(self, app):
+        """Configure the budget from the app config and load the tokenizer."""
+        self.context_windows = {**DEFAULT_CONTEXT_WINDOWS, **(app.config.get('MODEL_CONTEXT_WINDOWS') or {})}
+        self.var_max_tokens = app.config.get('TEMPLATE_VAR_MAX_TOKENS', self.var_max_tokens)
+        self.var_policy = app.config.get('TEMPLATE_VAR_POLICY', self.var_policy)
+        self.min_completion_tokens = app.config.get('MIN_COMPLETION_TOKENS', self.min_completion_tokens)
+        self.enabled = app.config.get('TOKEN_BUDGET_ENABLED', True)
+
+        if self.var_policy not in VAR_POLICIES:
+            raise ValueError(f"Unknown template variable policy: {self.var_policy}")
+
+        # Load the encoding now rather than on the first request
+        _encoding(self.model)
+
+    def context_window(self, model):
+        """Return the context window of a model by longest matching prefix."""
+        matches = [name for name in self.context_windows if model.startswith(name)]
+        return self.context_windows[max(matches, key=len)] if matches else FALLBACK_CONTEXT_WINDOW
+
+    def _summarize(self, items, joiner=', '):
+        """Keep the leading items of a list value that fit, noting how many were dropped."""
+        # Add items while they fit, keeping room for the "and N more" note
+        used = count_tokens(f"{joiner}and {len(items)} more", self.model)
+        joiner_tokens = count_tokens(joiner, self.model)
+        kept = []
+        for item in items:
+            cost = count_tokens(item, self.model) + (joiner_tokens if kept else 0)
+            if used + cost > self.var_max_tokens:
+                break
+            kept.append(item)
+            used += cost
+
+        if not kept:
+            return _truncate_to_tokens(joiner.join(items), self.var_max_tokens, self.model)
+        if len(kept) == len(items):
+            return joiner.join(kept)
+        return f"{joiner.join(kept)}{joiner}and {len(items) - len(kept)} more"
+
+    def fit_template_vars(self, template_vars):
+        """
+        Shorten oversized template variables according to the policy.
+
+        List values are joined with ', ' first, whether or not they are trimmed.
+
+        Returns:
+            tuple: (template variables, list of {'name', 'tokens', 'fitted_tokens'} for each shortened one)
+        """
+        fitted = dict(template_vars)
+        trimmed = []
+        for name, value in template_vars.items():
+            # Lists read the same in the prompt whether or not they end up trimmed
+            items = None
+            if isinstance(value, (list, tuple)):
+                items = [str(item) for item in value]
+                value = fitted[name] = ', '.join(items)
+            if not self.enabled or not isinstance(value, str):
+                continue
+            tokens = count_tokens(value, self.model)
+            if tokens <= self.var_max_tokens:
+                continue
+
+            if self.var_policy == 'reject':
+                raise BudgetError(
+                    f"Template variable '{name}' is {tokens} tokens, more than the {self.var_max_tokens} allowed"
+                )
+
+            if self.var_policy == 'summarize' and items is not None:
+                fitted[name] = self._summarize(items)
+            else:
+                fitted[name] = _truncate_to_tokens(value, self.var_max_tokens, self.model)
+            trimmed.append({'name': name, 'tokens': tokens, 'fitted_tokens': count_tokens(fitted[name], self.model)})
+
+        return fitted, trimmed
+
+    def fit(self, model, messages, max_tokens):
+        """
+        Fit a request into the model's context window.
+
+        Returns:
+            dict: Prompt token count, fitted max_tokens, context window and whether max_tokens
+            was lowered, or None when budgeting is disabled
+        """
+        if not self.enabled:
+            return None
+
+        context_window = self.context_window(model)
+        prompt_tokens = count_message_tokens(messages, model)
+        available = context_window - prompt_tokens
+
+        if available < self.min_completion_tokens:
+            raise BudgetError(
+                f"Prompt is {prompt_tokens} tokens, which leaves {max(available, 0)} of the {context_window}-token "
+                f"context of {model} for the completion (at least {self.min_completion_tokens} required)"
+            )
+
+        return {
+            'prompt_tokens': prompt_tokens,
+            'max_tokens': min(max_tokens, available),
+            'context_window': context_window,
+            'max_tokens_reduced': max_tokens > available,
+            'exact': _encoding(model) is not None
+        }
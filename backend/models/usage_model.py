@@ -0,0 +1,252 @@
+import os
+import atexit
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class UsageLedger:
+    """
+    Per-worker token usage ledger.
+
+    Calls are aggregated in memory into hourly buckets keyed by model, content
+    type and template, so recording is a dictionary update under a lock. A
+    background thread periodically flushes the buckets in a single transaction
+    to a local SQLite file shared by all workers on the host, and the remaining
+    buckets are flushed when the worker shuts down.
+    """
+
+    COUNTERS = ('calls', 'errors', 'prompt_tokens', 'completion_tokens', 'total_tokens', 'latency_ms_sum')
+
+    def __init__(self, db_path=None, flush_interval=30):
+        """
+        Initialize the ledger.
+
+        Args:
+            db_path (str): Path to the SQLite usage store (set from config in init_app)
+            flush_interval (float): Seconds between background flushes
+        """
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.app = None
+        self._pending = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """Configure the ledger from the app config and start the background flusher."""
+        self.app = app
+        self.db_path = app.config.get('USAGE_DB_PATH') or self.db_path
+        self.flush_interval = app.config.get('USAGE_FLUSH_INTERVAL', self.flush_interval)
+        self._local = threading.local()
+
+        self._ensure_schema()
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='usage-ledger-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _connect(self):
+        """Return this thread's connection to the usage store, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        """Create the usage table if it does not exist yet."""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS usage (
+                    hour TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    content_type TEXT NOT NULL,
+                    template TEXT NOT NULL,
+                    calls INTEGER NOT NULL,
+                    errors INTEGER NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    total_tokens INTEGER NOT NULL,
+                    latency_ms_sum REAL NOT NULL,
+                    latency_ms_max REAL NOT NULL,
+                    PRIMARY KEY (hour, model, content_type, template)
+                ) WITHOUT ROWID
+                '''
+            )
+
+    def record(self, model, content_type, template=None, tokens=None, latency_ms=0.0, error=False):
+        """
+        Record a single generation call.
+
+        Args:
+            model (str): Model used for the call
+            content_type (str): Type of content generated
+            template (str): Template name, if the call came from a template
+            tokens (dict): Token counts with 'prompt', 'completion' and 'total' keys
+            latency_ms (float): Upstream latency in milliseconds
+            error (bool): Whether the call failed
+        """
+        tokens = tokens or {}
+        hour = datetime.now().strftime('%Y-%m-%dT%H:00')
+        key = (hour, model or '', content_type or '', template or '')
+
+        with self._lock:
+            bucket = self._pending.get(key)
+            if bucket is None:
+                bucket = self._pending[key] = dict.fromkeys(self.COUNTERS, 0)
+                bucket['latency_ms_max'] = 0.0
+            bucket['calls'] += 1
+            bucket['errors'] += 1 if error else 0
+            bucket['prompt_tokens'] += tokens.get('prompt', 0)
+            bucket['completion_tokens'] += tokens.get('completion', 0)
+            bucket['total_tokens'] += tokens.get('total', 0)
+            bucket['latency_ms_sum'] += latency_ms
+            if latency_ms > bucket['latency_ms_max']:
+                bucket['latency_ms_max'] = latency_ms
+
+    def _merge_back(self, batch):
+        """Return an unflushed batch to the pending buckets so it is retried on the next flush."""
+        with self._lock:
+            for key, counts in batch.items():
+                bucket = self._pending.get(key)
+                if bucket is None:
+                    self._pending[key] = counts
+                    continue
+                for name in self.COUNTERS:
+                    bucket[name] += counts[name]
+                bucket['latency_ms_max'] = max(bucket['latency_ms_max'], counts['latency_ms_max'])
+
+    def flush(self):
+        """Write all pending buckets to the usage store in one transaction."""
+        if not self.db_path:
+            return
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+
+            if not batch:
+                return
+
+            rows = [
+                key + tuple(counts[name] for name in self.COUNTERS) + (counts['latency_ms_max'],)
+                for key, counts in batch.items()
+            ]
+
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        '''
+                        INSERT INTO usage (hour, model, content_type, template, calls, errors,
+                                           prompt_tokens, completion_tokens, total_tokens,
+                                           latency_ms_sum, latency_ms_max)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (hour, model, content_type, template) DO UPDATE SET
+                            calls = calls + excluded.calls,
+                            errors = errors + excluded.errors,
+                            prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                            completion_tokens = completion_tokens + excluded.completion_tokens,
+                            total_tokens = total_tokens + excluded.total_tokens,
+                            latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum,
+                            latency_ms_max = MAX(latency_ms_max, excluded.latency_ms_max)
+                        ''',
+                        rows
+                    )
+            except Exception as e:
+                self._merge_back(batch)
+                if self.app is not None:
+                    self.app.logger.error(f"Usage Ledger Flush Error: {str(e)}")
+
+    def _run(self):
+        """Background loop flushing pending buckets every flush_interval seconds."""
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the background flusher and write any remaining buckets."""
+        self._stop.set()
+        self.flush()
+
+    def rollup(self, granularity='hour', start=None, end=None, model=None, content_type=None, template=None):
+        """
+        Aggregate recorded usage into hourly or daily rollups.
+
+        Args:
+            granularity (str): 'hour' or 'day'
+            start (str): ISO date/time string for the first bucket to include
+            end (str): ISO date/time string for the last bucket to include
+            model (str): Only include this model
+            content_type (str): Only include this content type
+            template (str): Only include this template
+
+        Returns:
+            list: Rollup rows ordered by period
+        """
+        if granularity not in ('hour', 'day'):
+            raise ValueError("Granularity must be 'hour' or 'day'")
+
+        # Make sure this worker's recent calls are included
+        self.flush()
+
+        period = 'hour' if granularity == 'hour' else 'substr(hour, 1, 10)'
+        conditions = []
+        params = []
+        if start:
+            conditions.append('hour >= ?')
+            params.append(start[:16] if granularity == 'hour' else start[:10])
+        if end:
+            conditions.append(f'{period} <= ?')
+            params.append(end[:16] if granularity == 'hour' else end[:10])
+        for column, value in (('model', model), ('content_type', content_type), ('template', template)):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f'''
+                SELECT {period} AS period, model, content_type, template,
+                       SUM(calls), SUM(errors), SUM(prompt_tokens), SUM(completion_tokens),
+                       SUM(total_tokens), SUM(latency_ms_sum), MAX(latency_ms_max)
+                FROM usage
+                {where}
+                GROUP BY period, model, content_type, template
+                ORDER BY period, model, content_type, template
+                ''',
+                params
+            )
+            rows = cursor.fetchall()
+
+        return [
+            {
+                'period': period_value,
+                'model': model_value,
+                'content_type': content_type_value,
+                'template': template_value or None,
+                'calls': calls,
+                'errors': errors,
+                'tokens': {
+                    'prompt': prompt_tokens,
+                    'completion': completion_tokens,
+                    'total': total_tokens
+                },
+                'latency_ms': {
+                    'avg': round(latency_sum / calls, 1) if calls else 0.0,
+                    'max': round(latency_max, 1)
+                }
+            }
+            for (period_value, model_value, content_type_value, template_value, calls, errors,
+                 prompt_tokens, completion_tokens, total_tokens, latency_sum, latency_max) in rows
+        ]
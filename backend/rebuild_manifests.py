@@ -0,0 +1,21 @@
+import argparse
+import json
+from app import create_app
+from api.routes import manifest_index
+
+
+def main():
+    """Rebuild the per-day manifests from a full bucket scan."""
+    parser = argparse.ArgumentParser(description='Rebuild per-day content manifests from a bucket scan.')
+    parser.add_argument('--content-type', default=None,
+                        help='Only rebuild manifests for this content type')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        result = manifest_index.rebuild(args.content_type)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import os
+import time
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app
+from models.cassette_model import read_cassette
+
+
+def _percentile(values, fraction):
+    """Return a percentile of a sorted list."""
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 1)
+
+
+def main():
+    """Re-run recorded upstream traffic through the app offline and report throughput and latency."""
+    parser = argparse.ArgumentParser(
+        description='Replay a recorded cassette against this build with upstream calls served from the recording.'
+    )
+    parser.add_argument('cassette', help='Cassette directory recorded with UPSTREAM_CASSETTE_MODE=record')
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Multiplier for recorded upstream latencies (default: 1.0, 0 serves instantly)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Arrival rate multiplier relative to the recording; 0 sends as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='Maximum requests in flight (default: 32)')
+    args = parser.parse_args()
+
+    os.environ['UPSTREAM_CASSETTE_MODE'] = 'replay'
+    os.environ['UPSTREAM_CASSETTE_PATH'] = args.cassette
+    os.environ['UPSTREAM_REPLAY_LATENCY_SCALE'] = str(args.latency_scale)
+
+    app = create_app()
+
+    calls = sorted(read_cassette(args.cassette), key=lambda call: call['ts'])
+    if not calls:
+        print(json.dumps({'status': 'error', 'error': 'Cassette is empty'}))
+        return
+
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(call):
+        """Send one recorded call as a generation request."""
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+
+        request = call['request']
+        options = {key: value for key, value in request.items() if key not in ('messages', 'logprobs')}
+        if request.get('logprobs'):
+            options['rank'] = True
+
+        started = time.perf_counter()
+        response = client.post('/api/content/generate', json={
+            'prompt': request['messages'][-1]['content'],
+            'content_type': call['context'].get('content_type') or 'general',
+            'options': options
+        })
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        with lock:
+            latencies.append(latency_ms)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    first_ts = calls[0]['ts']
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for call in calls:
+            # Keep the recorded arrival pattern, compressed or stretched by --speed
+            if args.speed:
+                delay = (call['ts'] - first_ts) / args.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(send, call)
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    print(json.dumps({
+        'status': 'success',
+        'requests': len(latencies),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'duration_s': round(duration, 2),
+        'throughput_rps': round(len(latencies) / duration, 2) if duration else None,
+        'latency_ms': {
+            'p50': _percentile(latencies, 0.50),
+            'p95': _percentile(latencies, 0.95),
+            'p99': _percentile(latencies, 0.99),
+            'max': round(latencies[-1], 1)
+        }
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,64 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import ApiService from '../services/api.service';
 import { toast } from 'react-toastify';
 
+// Number of items fetched per page while scrolling the content list
+const PAGE_SIZE = 20;
+
 const ContentManagementPage = () => {
   const [contentItems, setContentItems] = useState([]);
   const [selectedContent, setSelectedContent] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const listRef = useRef(null);
+  const sentinelRef = useRef(null);
   const [filters, setFilters] = useState({
     contentType: '',
     startDate: '',
     endDate: ''
   });
   
-  // Fetch content when the component mounts or filters change
+  // Fetch the first page when the component mounts or filters change
   useEffect(() => {
     fetchContent();
   }, [filters]); // Re-fetch when filters change
   
-  const fetchContent = async () => {
+  // Load the next page when the end of the list scrolls into view
+  useEffect(() => {
+    if (!nextCursor || !sentinelRef.current) return undefined;
+    
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) {
+        fetchContent(nextCursor);
+      }
+    }, { root: listRef.current, rootMargin: '100px' });
+    
+    observer.observe(sentinelRef.current);
+    return () => observer.disconnect();
+  }, [nextCursor]);
+  
+  const fetchContent = async (cursor = null) => {
     try {
-      setIsLoading(true);
+      if (cursor) {
+        if (isLoadingMore) return;
+        setIsLoadingMore(true);
+      } else {
+        setIsLoading(true);
+      }
       
       const response = await ApiService.listContent(
         filters.contentType || null,
         filters.startDate || null,
-        filters.endDate || null
+        filters.endDate || null,
+        PAGE_SIZE,
+        cursor
       );
       
       if (response.data.status === 'success') {
-        setContentItems(response.data.data.items || []);
+        const items = response.data.data.items || [];
+        setContentItems((previous) => (cursor ? [...previous, ...items] : items));
+        setNextCursor(response.data.data.next_cursor || null);
       } else {
         throw new Error(response.data.error || 'Failed to fetch content');
       }
@@ -38,6 +68,7 @@ const ContentManagementPage = () => {
       console.error('Content Fetch Error:', error);
     } finally {
       setIsLoading(false);
+      setIsLoadingMore(false);
     }
   };
   
@@ -183,12 +214,12 @@ const ContentManagementPage = () => {
                 <p className="text-sm">Generate and save some content to see it here.</p>
               </div>
             ) : (
-              <div className="space-y-4 max-h-[500px] overflow-y-auto pr-2">
-                {contentItems.map((item, index) => {
+              <div ref={listRef} className="space-y-4 max-h-[500px] overflow-y-auto pr-2">
+                {contentItems.map((item) => {
                   const contentType = extractContentType(item.key);
                   return (
                     <div 
-                      key={index} 
+                      key={item.key} 
                       className={`p-3 border rounded-md cursor-pointer transition-colors ${selectedContent && item.key === selectedContent.storage_metadata?.filepath ? 'bg-blue-50 border-blue-300' : 'hover:bg-gray-50 border-gray-200'}`}
                       onClick={() => handleContentSelect(item)}
                     >
@@ -214,6 +245,13 @@ const ContentManagementPage = () => {
                     </div>
                   );
                 })}
+                
+                {/* Sentinel that triggers loading the next page */}
+                {nextCursor && (
+                  <div ref={sentinelRef} className="text-center py-2 text-sm text-gray-500">
+                    {isLoadingMore ? 'Loading more...' : ''}
+                  </div>
+                )}
               </div>
             )}
           </div>
@@ -67,14 +67,16 @@ class ApiService {
    * @param {string} startDate - ISO date string for start date filter
    * @param {string} endDate - ISO date string for end date filter
    * @param {number} limit - Maximum number of items to return
+   * @param {string} cursor - Opaque cursor from a previous page's next_cursor
    * @returns {Promise} - Promise with the API response
    */
-  static listContent(contentType = null, startDate = null, endDate = null, limit = 100) {
+  static listContent(contentType = null, startDate = null, endDate = null, limit = 100, cursor = null) {
     const params = new URLSearchParams();
     if (contentType) params.append('content_type', contentType);
     if (startDate) params.append('start_date', startDate);
     if (endDate) params.append('end_date', endDate);
     if (limit !== 100) params.append('limit', limit.toString());
+    if (cursor) params.append('cursor', cursor);
     
     return axios.get(`/api/storage/list?${params.toString()}`);
   }